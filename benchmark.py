@@ -0,0 +1,402 @@
+"""Benchmarks of the conversion and analysis steps on synthetic data shaped like the UK Biobank accelerometer files"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import datetime
+import gzip
+import io
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import profiler
+
+RAW_EPOCH = 5 # seconds between two raw measurements
+DAYSECONDS = 86400
+START_TIME = datetime.datetime(2014, 3, 24, 10, 0, 0)
+EPOCH = 60 # epoch the raw files are converted to for the benchmarks of processed data
+PERCENTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+PRECISION = 0.05
+FIRST_ID = 1000001 # participant ids count up from here
+# seconds importing a module may take in a new interpreter and the modules it must not load, checked by --startup
+STARTUP_BUDGETS = {"grsChronoComp": (0.05, ("numpy", "pytz", "gzip")),
+                   "dayPercentage": (0.1, ("numpy", "pytz", "gzip")),
+                   "featureReader": (0.4, ("pytz", "gzip")),
+                   "evalAccChronType": (0.4, ("pytz", "gzip")),
+                   "cohortSummary": (0.4, ("pytz", "gzip")),
+                   "epochConv": (0.4, ("pytz", "gzip")),
+                   "chronPercentile": (0.5, ("pytz", "gzip", "multiprocessing.shared_memory"))}
+STARTUP_CODE = "import sys, time\nstart = time.perf_counter()\nimport {}\nprint(time.perf_counter() - start)\n" \
+               "print(' '.join(sys.modules))"
+
+
+def getActivity(seconds, rng):
+    """
+    Creates activity values with a daily rhythm, low at night and high during the day, plus noise.
+    :param seconds: numpy array of the seconds since midnight of every measurement
+    :param rng: numpy random generator
+    :return: numpy array of the activity values in mg, rounded to one decimal place
+    """
+    hours = seconds / 3600.0
+    rhythm = 25 + 20 * np.sin((hours - 9) / 24 * 2 * np.pi)
+    return np.round(np.maximum(rhythm + rng.gamma(2.0, 5.0, len(seconds)) - 10, 0), 1)
+
+
+def writeRawFile(path, participant, days, rng):
+    """
+    Writes a raw 5 second file as provided by the UK Biobank.
+    :param path: path of the file, it is gzip compressed if it ends with .gz
+    :param participant: the participant id, only used to shift the start time
+    :param days: the length of the recording in days
+    :param rng: numpy random generator
+    :return: number of measurements in the file
+    """
+    start = START_TIME + datetime.timedelta(seconds=RAW_EPOCH * (participant % 720))
+    count = days * DAYSECONDS // RAW_EPOCH
+    end = start + datetime.timedelta(seconds=RAW_EPOCH * (count - 1))
+    secondsOfDay = (start.hour * 3600 + start.minute * 60 + start.second
+                    + np.arange(count, dtype=np.int64) * RAW_EPOCH) % DAYSECONDS
+    values = getActivity(secondsOfDay, rng)
+    imputed = (rng.random(count) < 0.02).astype(np.int64)
+    header = "acceleration (mg) - {} - {} - sampleRate = {} seconds, imputed\n".format(
+        start.strftime("%Y-%m-%d %H:%M:%S"), end.strftime("%Y-%m-%d %H:%M:%S"), RAW_EPOCH)
+    lines = ["{:.1f},{}\n".format(value, flag) for value, flag in zip(values.tolist(), imputed.tolist())]
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt") as file:
+        file.write(header)
+        file.writelines(lines)
+    return count
+
+
+def writeWakeFile(path, participants, days, rng):
+    """
+    Writes a file of wake and sleep times in the format used by Dr. Andrew Wood.
+    :param path: path of the file
+    :param participants: list of the participant ids
+    :param days: number of days per participant
+    :param rng: numpy random generator
+    :return: none
+    """
+    with open(path, "w") as file:
+        file.write("Filename\tDate\tWake_Time\tSleep_Date\tSleep_Time\tSource\n")
+        for participant in participants:
+            for day in range(-1, days + 1):
+                date = START_TIME.date() + datetime.timedelta(days=day)
+                wake = datetime.datetime.combine(date, datetime.time(6)) + \
+                    datetime.timedelta(seconds=int(rng.integers(0, 3 * 3600)))
+                sleep = wake + datetime.timedelta(seconds=int(rng.integers(14 * 3600, 18 * 3600)))
+                file.write("{}_90001_0_0.cwa\t{}\t{}\t{}\t{}\tsynthetic\n".format(
+                    participant, wake.strftime("%d/%m/%Y"), wake.strftime("%H:%M:%S"), sleep.strftime("%d/%m/%Y"),
+                    sleep.strftime("%H:%M:%S")))
+
+
+def writeFeatureFile(path, participants, days, rng):
+    """
+    Writes an accelerometer feature file with one row per participant and day.
+    :param path: path of the file
+    :param participants: list of the participant ids
+    :param days: number of days per participant
+    :param rng: numpy random generator
+    :return: number of rows in the file
+    """
+    import featureReader
+    rows = 0
+    with open(path, "w") as file:
+        file.write(featureReader.ACCELFEAT_HEADER)
+        for participant in participants:
+            for day in range(days):
+                date = START_TIME.date() + datetime.timedelta(days=day)
+                means = getActivity(np.arange(featureReader.HOURS) * 3600 + 1800, rng)
+                row = [str(participant), date.isoformat(), date.strftime("%A"), "1", "1", "1", "1", "1"]
+                for mean in means.tolist():
+                    row += ["N/A" if rng.random() < 0.02 else "{:.2f}".format(mean), "1", "1", "1", "1"]
+                row.append("0")
+                file.write("\t".join(row) + "\n")
+                rows += 1
+    return rows
+
+
+def writePercentileFile(path, participants, days, rng):
+    """
+    Writes a chronPercentile output file with times, the input of dayPercentage.
+    :param path: path of the file
+    :param participants: list of the participant ids
+    :param days: number of days per participant
+    :param rng: numpy random generator
+    :return: number of rows in the file
+    """
+    with open(path, "w") as file:
+        file.write("ID\tDate\t" + "\t".join(str(percentile) for percentile in PERCENTILES) + "\n")
+        for participant in participants:
+            for day in range(days):
+                date = START_TIME.date() + datetime.timedelta(days=day)
+                seconds = np.sort(rng.integers(0, DAYSECONDS, len(PERCENTILES))).tolist()
+                file.write("{}\t{}\t".format(participant, date.isoformat()) + "\t".join(
+                    "{:02d}:{:02d}:{:02d}".format(second // 3600, second // 60 % 60, second % 60)
+                    for second in seconds) + "\n")
+    return len(participants) * days
+
+
+def generateData(directory, participants, days, compress=True, seed=1):
+    """
+    Creates a synthetic data set in every input format of the scripts.
+    :param directory: directory to write the files to
+    :param participants: number of participants
+    :param days: length of the recordings in days
+    :param compress: whether the raw files should be gzip compressed
+    :param seed: seed of the random generator
+    :return: dictionary describing the data set, see the keys below
+    """
+    import epochConv
+    rng = np.random.default_rng(seed)
+    ids = list(range(FIRST_ID, FIRST_ID + participants))
+    rawDir = os.path.join(directory, "raw")
+    epochDir = os.path.join(directory, "epoch")
+    os.makedirs(rawDir, exist_ok=True)
+    os.makedirs(epochDir, exist_ok=True)
+    data = {"rawFiles": [], "epochFiles": [], "rawSamples": 0, "epochDir": epochDir,
+            "wakeFile": os.path.join(directory, "wake.tsv"), "featureFile": os.path.join(directory, "features.tsv"),
+            "percentileFile": os.path.join(directory, "percentiles.tsv")}
+    for participant in ids:
+        rawFile = os.path.join(rawDir, "{}_90001_0_0.csv{}".format(participant, ".gz" if compress else ""))
+        data["rawSamples"] += writeRawFile(rawFile, participant, days, rng)
+        data["rawFiles"].append(rawFile)
+        epochConv.workFile(rawFile, EPOCH, epochDir, noConsoleOutput=True)
+        data["epochFiles"].append(epochConv.getOutFileName(rawFile, epochDir, EPOCH))
+    writeWakeFile(data["wakeFile"], ids, days, rng)
+    data["featureRows"] = writeFeatureFile(data["featureFile"], ids, days, rng)
+    data["percentileRows"] = writePercentileFile(data["percentileFile"], ids, days * 100, rng)
+    return data
+
+
+def benchWorkFile(data, outdir):
+    """
+    :return: number of samples and files processed
+    """
+    import epochConv
+    for fileName in data["rawFiles"]:
+        epochConv.workFile(fileName, EPOCH, outdir, noConsoleOutput=True)
+    return data["rawSamples"], len(data["rawFiles"])
+
+
+def benchReadRaw(data, outdir):
+    import chronPercentile
+    samples = 0
+    for fileName in data["rawFiles"]:
+        samples += sum(len(day) for day in chronPercentile.readData(fileName)[1])
+    return samples, len(data["rawFiles"])
+
+
+def benchReadEpoch(data, outdir):
+    import chronPercentile
+    samples = 0
+    for fileName in data["epochFiles"]:
+        samples += sum(len(day) for day in chronPercentile.readData(fileName)[1])
+    return samples, len(data["epochFiles"])
+
+
+def benchReadFeature(data, outdir):
+    import chronPercentile
+    chronPercentile.readData(data["featureFile"])
+    return data["featureRows"], 1
+
+
+def benchChronPercentileDay(data, outdir):
+    import chronPercentile
+    days = [day for fileName in data["epochFiles"] for day in chronPercentile.readData(fileName)[1]]
+    start = time.perf_counter()
+    for day in days:
+        chronPercentile.chronPercentileDay(day, PERCENTILES, True, PRECISION)
+    return sum(len(day) for day in days), len(data["epochFiles"]), time.perf_counter() - start
+
+
+def benchWakeChronoPerc(data, outdir):
+    import chronPercentile
+    wakeIndex = chronPercentile.loadWakeIndex(data["wakeFile"])
+    files = [chronPercentile.readData(fileName, True) for fileName in data["epochFiles"]]
+    start = time.perf_counter()
+    samples = 0
+    for fileData in files:
+        activePeriods = chronPercentile.getActivePeriodIndex(fileData)
+        for id in dict.fromkeys(fileData[0]):
+            chronPercentile.wakeChronoPerc(fileData, id, PERCENTILES, wakeIndex, True, PRECISION, activePeriods)
+        samples += sum(len(day) for day in fileData[1])
+    return samples, len(files), time.perf_counter() - start
+
+
+def benchConvertPercentages(data, outdir):
+    import dayPercentage
+    dayPercentage.convertPercentages(data["percentileFile"], os.path.join(outdir, "dayPercentage.tsv"))
+    return data["percentileRows"], 1
+
+
+# name: (function, unit of the samples), functions return samples and files and optionally the time they measured
+# themselves, if they need to prepare their input first
+BENCHMARKS = {"workFile": (benchWorkFile, "raw samples"),
+              "readData raw": (benchReadRaw, "raw samples"),
+              "readData epoch": (benchReadEpoch, "epochs"),
+              "readData feature": (benchReadFeature, "rows"),
+              "chronPercentileDay": (benchChronPercentileDay, "epochs"),
+              "wakeChronoPerc": (benchWakeChronoPerc, "epochs"),
+              "convertPercentages": (benchConvertPercentages, "rows")}
+
+
+def runBenchmark(name, data, outdir):
+    """
+    Runs a single benchmark, main starts every benchmark in a new process so the peak memory belongs to it alone.
+    :param name: name of the benchmark in BENCHMARKS
+    :param data: the data set as returned by generateData
+    :param outdir: directory for output files
+    :return: dictionary of the results
+    """
+    function, unit = BENCHMARKS[name]
+    # the scripts report every file they read
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = function(data, outdir)
+        seconds = time.perf_counter() - start
+    if len(result) == 3:
+        seconds = result[2]
+    samples, files = result[0], result[1]
+    return {"name": name, "seconds": seconds, "samples": samples, "unit": unit, "files": files,
+            "samplesPerSecond": samples / seconds if seconds > 0 else None,
+            "filesPerSecond": files / seconds if seconds > 0 else None,
+            "peakRSSKB": profiler.getPeakMemory()}
+
+
+def runBenchmarks(data, outdir, names, repeat=1):
+    """
+    Runs the benchmarks, each in its own process. Of repeated runs the fastest one is reported.
+    :param data: the data set as returned by generateData
+    :param outdir: directory for output files
+    :param names: names of the benchmarks to run
+    :param repeat: number of runs of every benchmark
+    :return: list of the results of runBenchmark
+    """
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for name in names:
+        runs = []
+        for run in range(repeat):
+            with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as executor:
+                runs.append(executor.submit(runBenchmark, name, data, outdir).result())
+        best = min(runs, key=lambda run: run["seconds"])
+        best["peakRSSKB"] = max(run["peakRSSKB"] for run in runs) if best["peakRSSKB"] != None else None
+        results.append(best)
+    return results
+
+
+def getEnvironment():
+    """
+    :return: dictionary of the python and numpy versions, the platform and the number of cpus
+    """
+    return {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+            "cpus": os.cpu_count()}
+
+
+def writeReport(report, fileName=None):
+    """
+    :param report: dictionary of the results
+    :param fileName: file to write the report to as JSON, None to print it
+    :return: none
+    """
+    text = json.dumps(report, indent=2)
+    if fileName != None:
+        with open(fileName, "w") as outFile:
+            outFile.write(text + "\n")
+    else:
+        print(text)
+
+
+def measureStartup(module):
+    """
+    Imports a module in a new interpreter, started in the directory of the scripts
+    :param module: name of the module
+    :return: tuple of the seconds the import took and the set of the names of all loaded modules
+    """
+    output = subprocess.run([sys.executable, "-c", STARTUP_CODE.format(module)], capture_output=True, text=True,
+                            check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split("\n")
+    return float(output[0]), set(output[1].split())
+
+
+def checkStartup(names, repeat=5, budgetScale=1.0):
+    """
+    Checks the import time of the modules against their budgets in STARTUP_BUDGETS, so a run of e.g. dayPercentage
+    stays fast, and that they do not load the modules they are not allowed to, like the timezone database.
+    :param names: names of the modules in STARTUP_BUDGETS to check
+    :param repeat: number of imports of every module, the median time is compared to the budget
+    :param budgetScale: factor the budgets are multiplied with, e.g. for slower machines
+    :return: list of dictionaries of the results, "passed" is False if a module exceeds its budget or loads a
+    forbidden module
+    """
+    results = []
+    for name in names:
+        budget, forbidden = STARTUP_BUDGETS[name]
+        budget *= budgetScale
+        runs = [measureStartup(name) for run in range(repeat)]
+        seconds = statistics.median(run[0] for run in runs)
+        loaded = sorted(set(forbidden).intersection(*(run[1] for run in runs)))
+        results.append({"name": name, "seconds": seconds, "budgetSeconds": budget, "forbiddenLoaded": loaded,
+                        "passed": (seconds <= budget) & (not loaded)})
+    return results
+
+
+def main():
+    """
+    Generates a synthetic data set, runs the benchmarks and reports the results as JSON
+    :return: none
+    """
+    parser = argparse.ArgumentParser(description="Benchmarks of epochConv, chronPercentile and dayPercentage on "
+                                                 "synthetic data")
+    parser.add_argument("-n", type=int, dest="participants", default=4, help="number of participants, default 4")
+    parser.add_argument("-d", type=int, dest="days", default=7, help="length of the recordings in days, default 7")
+    parser.add_argument("-o", type=str, dest="out", help="file to write the results to, they are printed otherwise")
+    parser.add_argument("--data", type=str, help="directory to create the data set in and keep it, a temporary "
+                                                 "directory is used otherwise")
+    parser.add_argument("--plain", action="store_true", help="do not compress the raw files")
+    parser.add_argument("--repeat", type=int, default=1, help="number of runs of every benchmark, the fastest is "
+                                                              "reported")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run, all by default")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the random generator")
+    parser.add_argument("--startup", action="store_true", help="only check the import times of the scripts against "
+                        "their budgets instead, exits with status 1 if one is exceeded")
+    parser.add_argument("--budget-scale", type=float, default=1.0, dest="budgetScale", help="factor the --startup "
+                        "budgets are multiplied with, e.g. for slower machines, default 1")
+    args = parser.parse_args()
+    if args.startup:
+        results = checkStartup(list(STARTUP_BUDGETS), max(args.repeat, 5), args.budgetScale)
+        writeReport({"parameters": {"repeat": max(args.repeat, 5), "budgetScale": args.budgetScale}, "environment": getEnvironment(),
+                     "startup": results}, args.out)
+        failed = [result for result in results if not result["passed"]]
+        for result in failed:
+            print("ERROR: Importing {} took {:.3f}s of {:.3f}s and loaded {}.".format(
+                result["name"], result["seconds"], result["budgetSeconds"],
+                ", ".join(result["forbiddenLoaded"]) if result["forbiddenLoaded"] else "no forbidden modules"))
+        if failed:
+            sys.exit(1)
+        return
+    with tempfile.TemporaryDirectory() as temporary:
+        directory = args.data if args.data != None else temporary
+        start = time.perf_counter()
+        data = generateData(directory, args.participants, args.days, not args.plain, args.seed)
+        generation = time.perf_counter() - start
+        outdir = os.path.join(directory, "out")
+        os.makedirs(outdir, exist_ok=True)
+        results = runBenchmarks(data, outdir, args.only if args.only else list(BENCHMARKS), max(args.repeat, 1))
+    report = {"parameters": {"participants": args.participants, "days": args.days, "compressed": not args.plain,
+                             "epoch": EPOCH, "repeat": args.repeat, "seed": args.seed},
+              "environment": getEnvironment(),
+              "generationSeconds": generation,
+              "results": results}
+    writeReport(report, args.out)
+
+
+if __name__ == "__main__":
+    main()
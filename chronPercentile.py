@@ -1,155 +1,345 @@
 """Script to determine the times, where a certain percentile of daily activity is reached"""
 
 import argparse
+import cohortSummary
+import contextlib
 import datetime
+import hashlib
+import io
+import json
+import math
+import multiprocessing
 import os
-import gzip
+import numpy as np
 import epochConv
-import copy
+import featureReader
+import fileReader
+import profiler
 
 ALLOWED_EXTENSIONS = (".csv.gz", ".csv", ".tsv")
-ACCELFEAT_HEADER = "ID\tDate\tDay Of The Week\tMean (mg)\tStandard Deviation (mg)\tMedian (mg)\tQ1 (mg)\tQ3 (mg)\t" \
-                 "Mean HR00\tStandard Deviation HR00\tMedian HR00\tQ1 HR00\tQ3 HR00\t" \
-                 "Mean HR01\tStandard Deviation HR01\tMedian HR01\tQ1 HR01\tQ3 HR01\t" \
-                 "Mean HR02\tStandard Deviation HR02\tMedian HR02\tQ1 HR02\tQ3 HR02\t" \
-                 "Mean HR03\tStandard Deviation HR03\tMedian HR03\tQ1 HR03\tQ3 HR03\t" \
-                 "Mean HR04\tStandard Deviation HR04\tMedian HR04\tQ1 HR04\tQ3 HR04\t" \
-                 "Mean HR05\tStandard Deviation HR05\tMedian HR05\tQ1 HR05\tQ3 HR05\t" \
-                 "Mean HR06\tStandard Deviation HR06\tMedian HR06\tQ1 HR06\tQ3 HR06\t" \
-                 "Mean HR07\tStandard Deviation HR07\tMedian HR07\tQ1 HR07\tQ3 HR07\t" \
-                 "Mean HR08\tStandard Deviation HR08\tMedian HR08\tQ1 HR08\tQ3 HR08\t" \
-                 "Mean HR09\tStandard Deviation HR09\tMedian HR09\tQ1 HR09\tQ3 HR09\t" \
-                 "Mean HR10\tStandard Deviation HR10\tMedian HR10\tQ1 HR10\tQ3 HR10\t" \
-                 "Mean HR11\tStandard Deviation HR11\tMedian HR11\tQ1 HR11\tQ3 HR11\t" \
-                 "Mean HR12\tStandard Deviation HR12\tMedian HR12\tQ1 HR12\tQ3 HR12\t" \
-                 "Mean HR13\tStandard Deviation HR13\tMedian HR13\tQ1 HR13\tQ3 HR13\t" \
-                 "Mean HR14\tStandard Deviation HR14\tMedian HR14\tQ1 HR14\tQ3 HR14\t" \
-                 "Mean HR15\tStandard Deviation HR15\tMedian HR15\tQ1 HR15\tQ3 HR15\t" \
-                 "Mean HR16\tStandard Deviation HR16\tMedian HR16\tQ1 HR16\tQ3 HR16\t" \
-                 "Mean HR17\tStandard Deviation HR17\tMedian HR17\tQ1 HR17\tQ3 HR17\t" \
-                 "Mean HR18\tStandard Deviation HR18\tMedian HR18\tQ1 HR18\tQ3 HR18\t" \
-                 "Mean HR19\tStandard Deviation HR19\tMedian HR19\tQ1 HR19\tQ3 HR19\t" \
-                 "Mean HR20\tStandard Deviation HR20\tMedian HR20\tQ1 HR20\tQ3 HR20\t" \
-                 "Mean HR21\tStandard Deviation HR21\tMedian HR21\tQ1 HR21\tQ3 HR21\t" \
-                 "Mean HR22\tStandard Deviation HR22\tMedian HR22\tQ1 HR22\tQ3 HR22\t" \
-                 "Mean HR23\tStandard Deviation HR23\tMedian HR23\tQ1 HR23\tQ3 HR23\t" \
-                 "Daylight Savings\n"
+ACCELFEAT_HEADER = featureReader.ACCELFEAT_HEADER
+DAYSECONDS = 86400
+WAKE_HEADER = "Filename\tDate\tWake_Time\tSleep_Date\tSleep_Time\t"
+WAKE_CACHE_EXTENSION = ".npz" # appended to the wake file name for the cached wake period index
+WORKER_SETTINGS = None # settings of a worker process in a parallel run, see initWorker
+WORKER_STORE = None # the ParticipantStore a worker process is attached to, see processParticipantsTask
+SHARED_CHUNKS = 4 # number of participant chunks per worker in a --shared run, to even out their load
+PROFILE_EMPTY = 0 # states of the days and wake periods in a profile, see getDayProfile and getWakeProfile
+PROFILE_INACTIVE = 1
+PROFILE_ACTIVE = 2
+PROFILE_CACHE_EXTENSION = ".npz"
+PROFILE_CACHE_SIZE = 1024 # default size limit of the profile cache in MB
+PROFILE_CACHE_VERSION = 1 # part of every cache key, to be increased whenever the profiles change
+
+
+class DayData:
+    """
+    The measurements of one day, stored column wise as the local time of every measurement (datetime64[s]) and the
+    measured values (float32).
+    """
+    __slots__ = ("times", "values")
+
+    def __init__(self, times, values):
+        """
+        :param times: times of the measurements, anything numpy can convert to datetime64[s]
+        :param values: the measured values in the same order
+        """
+        self.times = np.asarray(times, dtype="datetime64[s]")
+        self.values = np.asarray(values, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.values)
+
+    def getDate(self):
+        """
+        :return: the date of the first measurement as YYYY-MM-DD
+        """
+        return str(self.times[0].astype("datetime64[D]"))
+
+    def getTime(self, index):
+        """
+        :param index: index of a measurement
+        :return: the time of the measurement as a datetime object
+        """
+        return self.times[index].item()
+
+    def getSeconds(self):
+        """
+        :return: the times of the measurements as int64 seconds since 1970-01-01
+        """
+        return self.times.astype(np.int64)
+
+    def getSecondsOfDay(self):
+        """
+        :return: the times of the measurements as int64 seconds since the start of their day
+        """
+        return (self.times - self.times.astype("datetime64[D]")).astype(np.int64)
+
+
+def toSeconds(dateTime):
+    """
+    Converts a datetime object into the time scale of DayData.getSeconds, ignoring its timezone
+    :param dateTime: the datetime object
+    :return: seconds since 1970-01-01 as int
+    """
+    return int(np.datetime64(dateTime.replace(tzinfo=None), "s").astype(np.int64))
+
+
+def findPercentileIndices(percents, percentileList, precision):
+    """
+    Finds for every percentile the first index at which the cumulative percentage is closest to it, the same index a
+    scan over all values keeping the first closest match within precision would find. While the percentages do not
+    decrease, the closest indices are located with a binary search, otherwise all distances are compared.
+    :param percents numpy array of the cumulative activity as a fraction of the total activity
+    :param percentileList list of percentages to find
+    :param precision how close a value needs to match a given percentage
+    :return list of indices, None where no percentage was close enough
+    """
+    indices = [None for i in range(len(percentileList))]
+    if len(percents) == 0:
+        return indices
+    limit = min(precision, 1) # a match also needs to be closer than the initial distance of 1
+    ascending = bool(np.all(percents[1:] >= percents[:-1]))
+    for j in range(len(percentileList)):
+        if ascending:
+            # the closest values are right below and at/above the percentile, equal values count from their first index
+            above = int(np.searchsorted(percents, percentileList[j], side="left"))
+            candidates = []
+            if above > 0:
+                candidates.append(int(np.searchsorted(percents, percents[above - 1], side="left")))
+            if above < len(percents):
+                candidates.append(above)
+        else:
+            candidates = [int(np.argmin(np.abs(percents - percentileList[j])))]
+        bestDistance = limit
+        for n in candidates: # ascending order, so the earlier index wins on equal distance
+            distance = abs(percents[n] - percentileList[j])
+            if distance < bestDistance:
+                indices[j] = n
+                bestDistance = distance
+    return indices
 
 
 def chronPercentileDay(dayData, percentileList, percentage, precision):
     """
     Calculates percentiles for a given Day.
-    dayData should be given as a two dimensional array with the time as a datetime object and the accelerometer average for that period.
+    dayData should be given as DayData with the times and the accelerometer average for that period.
     It also takes a list of percentiles for which the times should be given.
-    :param dayData two dimensional array of datetime objects in column 0 and values in column 1
+    The cumulative activity is computed once and each percentile is then located with findPercentileIndices.
+    :param dayData DayData of a single day
     :param percentileList list of percentages to record the times for
     :param precision how close a value needs to match a given percentage
     :return list of datetime objects that correlate in order to the given percentileList
     """
+    return dayPercentiles(getDayProfile(dayData), percentileList, percentage, precision)
+
+def getDayProfile(dayData):
+    """
+    Computes the cumulative activity of a day, everything chronPercentileDay needs to find any percentile.
+    :param dayData: DayData of a single day
+    :return: tuple of the measurement times as seconds (see DayData.getSeconds), the cumulative activity as a fraction
+    of the total activity of the day and the state of the day, PROFILE_EMPTY, PROFILE_INACTIVE or PROFILE_ACTIVE. The
+    fractions are all 0 unless the state is PROFILE_ACTIVE.
+    """
+    seconds = dayData.getSeconds()
+    if len(dayData) == 0:
+        return seconds, np.zeros(0), PROFILE_EMPTY
+    cumulative = np.cumsum(dayData.values, dtype=np.float64)
+    daySum = cumulative[-1]
+    if daySum == 0:
+        return seconds, np.zeros(len(cumulative)), PROFILE_INACTIVE
+    return seconds, cumulative / daySum, PROFILE_ACTIVE
+
+def dayPercentiles(profile, percentileList, percentage, precision):
+    """
+    Finds the percentiles of a day in its profile.
+    :param profile: the profile of the day as returned by getDayProfile
+    :param percentileList list of percentages to record the times for
+    :param percentage: whether the results should be percentages of the day instead of times
+    :param precision how close a value needs to match a given percentage
+    :return list of datetime objects or percentages that correlate in order to the given percentileList
+    """
+    seconds, percents, state = profile
     result = ["NA" for i in range(len(percentileList))]
-    daySum = sum(dayData[1])
-    currentSum = 0
-    offsets =  [percentileList,
-                [0 for i in range(len(percentileList))],
-                [ 1 for i in range(len(percentileList))],
-                [ None  for i in range(len(percentileList))]]
-        # stores the index closest to the required percentage and its distance and time-> required percent, ind, distance, time
-    for n in range(len(dayData[1])):
-        # for every datapoint check whether a percentile is reached, and save the time
-        currentSum += dayData[1][n]
-        try:
-            percent = currentSum / daySum
-        except ZeroDivisionError:
-            print("No Data present")
-            continue
-        for j in range(len(percentileList)):
-            # check for all percentages
-            distance = abs(percent - percentileList[j])
-            if distance < precision and distance < offsets[2][j]:
-                offsets[3][j] = dayData[0][n]   # time
-                offsets[2][j] = distance        # distance
-                offsets[1][j] = (dayData[0][n].replace(tzinfo=None) - datetime.datetime(dayData[0][n].year, dayData[0][n].month, dayData[0][n].day)).total_seconds() / 86400                # percentage of the full day
-    for k in range(len(offsets[0])):
-        if  offsets[3][k] != None and offsets[1][k] != None:
+    if state == PROFILE_EMPTY:
+        return result
+    if state == PROFILE_INACTIVE:
+        print("No Data present")
+        return result
+    indices = findPercentileIndices(percents, percentileList, precision)
+    for k in range(len(indices)):
+        if indices[k] != None:
             if percentage:
-                result[k] = offsets[1][k]
+                result[k] = int(seconds[indices[k]] % DAYSECONDS) / DAYSECONDS # percentage of the full day
             else:
-                result[k] = offsets[3][k]
+                result[k] = secondsToTime(seconds[indices[k]])
     return result
 
+def secondsToTime(seconds):
+    """
+    :param seconds: seconds since 1970-01-01 as stored by DayData
+    :return: the local time as a datetime object
+    """
+    return np.datetime64(int(seconds), "s").item()
+
+def getProfileDate(profile):
+    """
+    :param profile: the profile of a day as returned by getDayProfile
+    :return: the date of the first measurement of the day as YYYY-MM-DD
+    """
+    return str(np.datetime64(int(profile[0][0]), "s").astype("datetime64[D]"))
 
 def getTotalActivity(idTime, start, end ):
-    mgSum = 0
-    for i in range(len(idTime[0])):
-        if idTime[0][i].replace(tzinfo=None) >= start.replace(tzinfo=None) and idTime[0][i].replace(tzinfo=None) <=end.replace(tzinfo=None):
-            mgSum += idTime[1][i]
-    return mgSum
+    inside = (idTime.times >= np.datetime64(start.replace(tzinfo=None), "s")) & \
+             (idTime.times <= np.datetime64(end.replace(tzinfo=None), "s"))
+    return float(idTime.values[inside].sum(dtype=np.float64))
 
 
-def wakeChronoPerc(Data, id, percentileList, wakeData, percent,precision):
-    wakeTime = getWakePeriods(id, wakeData) # [[starttime, endtime]]
-    dayResults = []  # list of (date (list of times))
-    if wakeTime != None:
-        idTime = getActivePeriods(id, Data)
+def getWindowIndices(seconds, start, end):
+    """
+    Locates the measurements inside a time window with a binary search.
+    :param seconds: sorted numpy array of measurement times as seconds, see DayData.getSeconds
+    :param start: start of the window in seconds, inclusive
+    :param end: end of the window in seconds, inclusive
+    :return: tuple of the first index inside the window and the first index after it
+    """
+    return int(np.searchsorted(seconds, start, side="left")), int(np.searchsorted(seconds, end, side="right"))
+
+
+def wakeChronoPerc(Data, id, percentileList, wakeData, percent,precision, activePeriods=None):
+    """
+    Calculates the percentiles of every wake period of a participant. Only activity during a wake period counts and
+    the percentages are based on the time since waking up in relation to the length of the wake period.
+    See getWakeProfile and wakePercentiles for how the wake periods are processed.
+    :param Data: the data as returned by readData
+    :param id: the participant id
+    :param percentileList: list of percentages to record the times for
+    :param wakeData: the wake periods as returned by loadWakeIndex or loadWakeHourFile
+    :param percent: whether the results should be percentages of the wake period instead of times
+    :param precision: how close a value needs to match a given percentage
+    :param activePeriods: optional index of the measurements of every participant, see getActivePeriodIndex
+    :return: list of [date, list of results] for every reported wake period
+    """
+    profile = getWakeProfile(Data, id, wakeData, activePeriods)
+    if profile is None:
+        return []
+    return wakePercentiles(profile, percentileList, percent, precision)
+
+def getWakeProfile(Data, id, wakeData, activePeriods=None):
+    """
+    Computes the cumulative activity of every wake period of a participant, everything wakeChronoPerc needs to find
+    any percentile.
+    The measurements are processed as a scan over all of them in time order would: the measurements after the end of
+    a wake period close it, the first of them is not counted and the next wake period starts. Instead of scanning,
+    the measurements of a wake period are located with a binary search. Processing stops at the first wake period
+    still open at the end of the data.
+    :param Data: the data as returned by readData
+    :param id: the participant id
+    :param wakeData: the wake periods as returned by loadWakeIndex or loadWakeHourFile
+    :param activePeriods: optional index of the measurements of every participant, see getActivePeriodIndex
+    :return: tuple of the sorted measurement times of the participant as seconds, a list with a tuple of (start, end,
+    index of the first counted measurement, state, cumulative activity as a fraction of the activity of the period)
+    for every processed wake period and whether the last of them is still open. The state is PROFILE_EMPTY if no
+    measurement is counted, PROFILE_INACTIVE if there is no activity and PROFILE_ACTIVE otherwise. None if the
+    participant has no wake periods.
+    """
+    with profiler.stage("wakeLookup"):
+        if isinstance(wakeData, dict):
+            wakeTime = getIndexedWakePeriods(id, wakeData) # [[starttime, endtime]] in seconds
+        else:
+            wakeTime = getWakePeriods(id, wakeData) # [[starttime, endtime]]
+            if wakeTime != None:
+                wakeTime = [[toSeconds(period[0]), toSeconds(period[1])] for period in wakeTime]
+        if wakeTime is None:
+            return None
+        if activePeriods != None:
+            idTime = activePeriods.get(int(id.split("_")[0]), DayData([], []))
+        else:
+            idTime = getActivePeriods(id, Data)
+    seconds = idTime.getSeconds()
+    values = idTime.values
+    if np.any(seconds[1:] < seconds[:-1]):
+        order = np.argsort(seconds, kind="stable")
+        seconds = seconds[order]
+        values = values[order]
+    # we have all the data for being awake and their normal
+    periods = []
+    lastOpen = False
+    position = 0 # index of the next measurement to process
+    for wakeDayCounter in range(len(wakeTime)):
+        start = int(wakeTime[wakeDayCounter][0])
+        end = int(wakeTime[wakeDayCounter][1])
+        windowStart, windowEnd = getWindowIndices(seconds, start, end)
+        dayActivity = float(values[windowStart:windowEnd].sum(dtype=np.float64))
+        # measurements before position belong to earlier periods, the ones before the window are asleep
+        last = max(position, windowEnd)
+        first = min(max(position, windowStart), last)
+        if first >= last:
+            periods.append((start, end, first, PROFILE_EMPTY, np.zeros(0)))
+        elif dayActivity == 0:
+            periods.append((start, end, first, PROFILE_INACTIVE, np.zeros(last - first)))
+        else:
+            periods.append((start, end, first, PROFILE_ACTIVE,
+                            np.cumsum(values[first:last], dtype=np.float64) / dayActivity))
+        if last >= len(seconds):
+            # no measurement after the end of this period, it stays open
+            lastOpen = True
+            break
+        position = last + 1 # the measurement closing the period is not counted
+    return seconds, periods, lastOpen
 
+def wakePercentiles(profile, percentileList, percent, precision):
+    """
+    Finds the percentiles of the wake periods of a participant in its profile. The first wake period and the one still
+    open at the end of the data are not reported.
+    :param profile: the profile of the participant as returned by getWakeProfile
+    :param percentileList: list of percentages to record the times for
+    :param percent: whether the results should be percentages of the wake period instead of times
+    :param precision: how close a value needs to match a given percentage
+    :return: list of [date, list of results] for every reported wake period
+    """
+    seconds, periods, lastOpen = profile
+    dayResults = []  # list of (date (list of times))
+    for wakeDayCounter in range(len(periods)):
+        start, end, first, state, percents = periods[wakeDayCounter]
         offsets = [percentileList,
                    [0 for i in range(len(percentileList))],
-                   [1 for i in range(len(percentileList))],
                    [None for i in range(len(percentileList))]]
-        wakeDayCounter = 0
-        dayActivity = getTotalActivity(idTime, wakeTime[wakeDayCounter][0], wakeTime[wakeDayCounter][1])
-        currentSum = 0
-        firstRun = True
-        # we have all the data for being awake and their normal
-        print("Yiha")
-        for i in range(len(idTime[0])):
-            if idTime[0][i].replace(tzinfo=None) >= wakeTime[wakeDayCounter][0].replace(tzinfo=None) and \
-                    idTime[0][i].replace(tzinfo=None) <= wakeTime[wakeDayCounter][1].replace(tzinfo=None):
-                # the time is measured during wake hours
-                # for every datapoint check whether a percentile is reached, and save the time
-                currentSum += idTime[1][i]
-                try:
-                    percent = currentSum / dayActivity
-                except ZeroDivisionError:
-                    print("No Data present")
-                    continue
-                for j in range(len(percentileList)):
-                    # check for all percentages
-                    distance = abs(percent - percentileList[j])
-                    if distance < precision and distance < offsets[2][j]:
-                        offsets[3][j] = idTime[0][i]  # time
-                        offsets[2][j] = distance  # distance
-                        offsets[1][j] = (idTime[0][i].replace(tzinfo=None) - wakeTime[wakeDayCounter][0].replace(tzinfo=None)).total_seconds()/\
-                                        (wakeTime[wakeDayCounter][1].replace(tzinfo=None) \
-                                         - wakeTime[wakeDayCounter][0].replace(tzinfo=None)).total_seconds()  # time percentage
-
-            elif idTime[0][i].replace(tzinfo=None) > wakeTime[wakeDayCounter][1].replace(tzinfo= None):
-                if not firstRun :
-                    if percent:
-                        if offsets[3][0] != None and offsets[1][0] != None:
-                            dayResults.append([offsets[3][0].strftime("%Y-%m-%d"), offsets[1]])
-                    else:
-                        if offsets[3][0] != None:
-                            dayResults.append([offsets[3][0].strftime("%Y-%m-%d"), offsets[3]])
-                offsets = [percentileList,
-                           [0 for i in range(len(percentileList))],
-                           [1 for i in range(len(percentileList))],
-                           [None for i in range(len(percentileList))]]
-                try:
-                    wakeDayCounter += 1
-                    dayActivity = getTotalActivity(idTime, wakeTime[wakeDayCounter][0], wakeTime[wakeDayCounter][1])
-                except IndexError:
-                    break
-                currentSum = 0
-                firstRun = False
-        # store in final list
+        # the time is measured during wake hours
+        if state == PROFILE_INACTIVE:
+            print("No Data present")
+        elif state == PROFILE_ACTIVE:
+            indices = findPercentileIndices(percents, percentileList, precision)
+            for j in range(len(indices)):
+                if indices[j] != None:
+                    offsets[2][j] = first + indices[j]  # index of the time
+                    offsets[1][j] = (int(seconds[first + indices[j]]) - start) / (end - start)  # time percentage
+        if lastOpen and wakeDayCounter == len(periods) - 1:
+            break
+        if wakeDayCounter > 0:
+            if percent:
+                if offsets[2][0] != None and offsets[1][0] != None:
+                    dayResults.append([secondsToTime(seconds[offsets[2][0]]).strftime("%Y-%m-%d"), offsets[1]])
+            else:
+                if offsets[2][0] != None:
+                    dayResults.append([secondsToTime(seconds[offsets[2][0]]).strftime("%Y-%m-%d"),
+                                       [secondsToTime(seconds[n]) if n != None else None for n in offsets[2]]])
+    # store in final list
     return dayResults
 
-
-
-
-
-    #find wake data that may influence the dayData
+def getIndexedWakePeriods(id, wakeIndex):
+    """
+    Looks up the wake periods of a participant in a wake period index.
+    :param id: the participant id, anything after the first "_" is ignored
+    :param wakeIndex: the index as returned by loadWakeIndex
+    :return: numpy array with one row of [start, end] in seconds per wake period, sorted by start, or None if the
+    participant is not part of the index
+    """
+    number = getParticipantNumber(id)
+    periods = wakeIndex.get(number) if number != None else None
+    if periods is None:
+        print("ID " + id.split("_")[0] + " could not be found in given sleep data set.")
+    return periods
 
 def getWakePeriods(id, wakeData):
     periods = []
@@ -162,185 +352,359 @@ def getWakePeriods(id, wakeData):
     except ValueError:
         periods = None
         print("ID " +  id.split("_")[0] + " could not be found in given sleep data set.")
-    print(periods)
     return periods
 
+def getParticipantNumber(id):
+    """
+    :param id: the participant id, anything after the first "_" is ignored
+    :return: the participant number wake data is stored under, None if the id does not start with a number, like the
+    ids of prefixed epochConv outputs
+    """
+    number = id.split("_")[0]
+    return int(number) if number.isdigit() else None
+
 def getActivePeriods(id, data):
-    periods = [[],[]]
+    days = []
     for i in range(len(data[0])):
-        if int(data[0][i].split("_")[0]) == int(id.split("_")[0]):
-            periods[0].extend(data[1][i][0])
-            periods[1].extend(data[1][i][1])
+        if getParticipantNumber(data[0][i]) == getParticipantNumber(id):
+            days.append(data[1][i])
     # TODO find better solution for guranteeing of order of days
-    return periods
+    if not days:
+        return DayData([], [])
+    return DayData(np.concatenate([day.times for day in days]), np.concatenate([day.values for day in days]))
+
+def getActivePeriodIndex(data):
+    """
+    Collects the measurements of every participant in one pass over the data, instead of calling getActivePeriods
+    for each participant.
+    :param data: the data as returned by readData
+    :return: dictionary of the participant id (int) to the DayData of all its measurements. Participants without a
+    numeric id can not have wake data and are left out.
+    """
+    days = {}
+    for i in range(len(data[0])):
+        number = getParticipantNumber(data[0][i])
+        if number != None:
+            days.setdefault(number, []).append(data[1][i])
+    return {id: DayData(np.concatenate([day.times for day in idDays]), np.concatenate([day.values for day in idDays]))
+            for id, idDays in days.items()}
 
 
 
 
 
-def readData(fileName, lastDay=False):
+def readData(fileName, lastDay=False, epoch=None, daylightSavingsTime=False, teeDir=None):
     """
     Reads a file object to convert it into usable data formats. During this the first and last day for each id are
     truncated.
     :param fileName: the file object that should be read
-    :return: a list with each row being two lists, where list 0 contains times and list 1 values whilst each row
-    represent a single day
+    :param epoch: if given, raw data is averaged to this epoch in seconds as epochConv would, see readRawEpochData
+    :param daylightSavingsTime: whether raw data averaged to an epoch gets daylight savings time adjusted timestamps
+    :param teeDir: directory to also write the averaged epoch files to, None to not write them
+    :return: a list with two lists, list 0 contains the ids and list 1 the DayData of each day
+    """
+    return collectDays(iterData(fileName, lastDay, epoch, daylightSavingsTime, teeDir))
+
+def collectDays(days):
+    """
+    :param days: iterable of (id, DayData) tuples as yielded by the iter... readers
+    :return: a list with two lists, list 0 contains the ids and list 1 the DayData of each day
+    """
+    results = [[],[]]
+    for id, day in days:
+        results[0].append(id)
+        results[1].append(day)
+    return results
+
+def iterData(fileName, lastDay=False, epoch=None, daylightSavingsTime=False, teeDir=None):
+    """
+    Reads a file day by day, the generator version of readData. Every day is yielded as soon as it is complete, so only
+    one day of the file is held in memory.
+    :param fileName: the file object that should be read
+    :param lastDay: whether the last day should be yielded as well
+    :param epoch: if given, raw data is averaged to this epoch in seconds as epochConv would, see iterRawEpochData
+    :param daylightSavingsTime: whether raw data averaged to an epoch gets daylight savings time adjusted timestamps
+    :param teeDir: directory to also write the averaged epoch files to, None to not write them
+    :return: generator of (id, DayData) tuples
     """
     # there can be three types of files this script can operate with, original 5 second data, processed raw Data and feature data
-    results = None
     if not fileName.endswith(ALLOWED_EXTENSIONS) :
         raise AttributeError("Wrong file format. Expecting {}, found {} .  Please change input!".format(
             ALLOWED_EXTENSIONS,
             os.path.splitext(fileName)[1]))
-    compressed = False
-    try: # opening the file
-        if os.path.splitext(fileName)[1] == ".gz":
-            #compressed data, check if raw data
-            datFile = gzip.open(fileName, "rt")
-            compressed = True
-        else:
-            # not compressed so maybe not raw data
-            datFile = open(fileName, "r")
+    try: # opening the file, compressed data is decompressed by the reader
+        datFile = fileReader.openLines(fileName)
     except IOError:
         print("Could not open file {}".format(fileName))
-        return None
+        return
 
     try: # reading the file
         # check correct file contents
         header = datFile.readline()
         if (ACCELFEAT_HEADER == header):
-            results = readAccelFeatureData(datFile)
+            yield from iterAccelFeatureData(datFile)
 
+        elif "Measurement from" in header and hasSidecar(fileName):
+            # processed data with a binary copy written by epochConv
+            yield from iterSidecarData(fileName)
         elif "Measurement from" in header:
             #processed data
-            results= readProcessedData(datFile)
+            yield from iterProcessedData(datFile)
+        elif header.startswith("acceleration") and epoch != None:
+            # raw data, read like the processed data epochConv would create from it
+            yield from iterRawEpochData(datFile, epoch, daylightSavingsTime, teeDir)
         elif header.startswith("acceleration"):
             # raw data
-            results= readRawData(datFile, lastDay)
+            yield from iterRawData(datFile, lastDay)
         else:
             print("could not determine format")
     finally:
         datFile.close()
-    return results
 
 def readRawData(file, lastDay= False):
     """
     To use to read raw data files into the chronPercentile Script
     :param file: file object from where to read the data
-    :return: a list with each row being two lists, where list 0 contains times and list 1 values whilst each row
-    represent a single day
+    :return: a list with two lists, list 0 contains the ids and list 1 the DayData of each day
+    """
+    return collectDays(iterRawData(file, lastDay))
+
+def iterRawData(file, lastDay=False):
+    """
+    Generator version of readRawData
+    :param file: file object from where to read the data
+    :param lastDay: whether the last day should be yielded as well
+    :return: generator of (id, DayData) tuples
     """
     print("Found Raw Data in {}".format(file.name))
-    results = [[],[]]
-    result = [[],[]]
+    id = (os.path.basename(file.name)).split(".")[0]
     file.seek(0)
     header = file.readline()
+    # raw timestamps advance by EPOCH_TIME per line, so the day of a line follows from its offset
+    startSeconds = int(epochConv.getTimeStampArray(header, np.zeros(1, dtype=np.int64))[0].astype(np.int64))
+    offsets = []
+    values = []
     offset = 0
-    currentTime = None
-    oldTime = None
+    currentDay = None
+    oldDay = None
     startDay = True
     for line in file:
-        oldTime = currentTime
+        oldDay = currentDay
         offset += 1
-        currentTime = epochConv.getTimeStampDT(header, offset, 5)
-        if  (oldTime != None) and (currentTime.day != oldTime.day):
+        currentDay = (startSeconds + offset * epochConv.EPOCH_TIME) // DAYSECONDS
+        if  (oldDay != None) and (currentDay != oldDay):
             if not startDay:
-                if len(result[1]) != 0 : # no values saved for the day... skip the day
-                    results[0].append((os.path.basename(file.name)).split(".")[0])
-                    results[1].append(copy.deepcopy(result))
+                if len(values) != 0 : # no values saved for the day... skip the day
+                    with profiler.stage("timestamps"):
+                        times = epochConv.getTimeStampArray(header, np.array(offsets, dtype=np.int64))
+                    yield id, DayData(times, values)
             startDay = False
-            result[0].clear()
-            result[1].clear()
+            offsets = []
+            values = []
         try:
-            result[1].append(float(line.split(",")[0]))
-            result[0].append(currentTime)
+            values.append(float(line.split(",")[0]))
+            offsets.append(offset)
         except ValueError:
             pass # the line is incomplete and has to be skipped
+    profiler.count("samples", offset)
     if lastDay:
-        results[0].append((os.path.basename(file.name)).split(".")[0])
-        results[1].append(copy.deepcopy(result))
-        result[0].clear()
-        result[1].clear()
-    return results
+        yield id, DayData(epochConv.getTimeStampArray(header, np.array(offsets, dtype=np.int64)), values)
+
+def readRawEpochData(file, epoch, daylightSavingsTime=False, teeDir=None, lastDay=False):
+    """
+    To use to read raw data files into the chronPercentile Script averaged to a longer epoch. The days are the same as
+    the ones readProcessedData reads from the file epochConv creates, but the epochs are passed on directly instead of
+    being written and parsed again.
+    :param file: file object from where to read the data
+    :param epoch: the epoch in seconds to average to, a multiple of epochConv.EPOCH_TIME
+    :param daylightSavingsTime: whether the timestamps should be adjusted for daylight savings time
+    :param teeDir: directory to write the epoch file to as epochConv would, None to not write it
+    :return: a list with two lists, list 0 contains the ids and list 1 the DayData of each day
+    """
+    return collectDays(iterRawEpochData(file, epoch, daylightSavingsTime, teeDir, lastDay))
+
+def iterRawEpochData(file, epoch, daylightSavingsTime=False, teeDir=None, lastDay=False):
+    """
+    Generator version of readRawEpochData. The epoch file is only written to teeDir, if the generator is exhausted.
+    :param file: file object from where to read the data
+    :param epoch: the epoch in seconds to average to, a multiple of epochConv.EPOCH_TIME
+    :param daylightSavingsTime: whether the timestamps should be adjusted for daylight savings time
+    :param teeDir: directory to write the epoch file to as epochConv would, None to not write it
+    :param lastDay: whether the last day should be yielded as well
+    :return: generator of (id, DayData) tuples
+    """
+    print("Found Raw Data in {}, averaging to {} seconds".format(file.name, epoch))
+    id = (os.path.basename(file.name)).split(".")[0]
+    file.seek(0)
+    headerLine = file.readline()
+    output = None
+    if teeDir != None:
+        output = epochConv.OutputFile(epochConv.getOutFileName(file.name, teeDir, epoch))
+        output.write([epochConv.header(headerLine, epoch)])
+    times = []
+    values = []
+    currentDay = None
+    startDay = True
+    skipFirst = True # readProcessedData skips the first epoch of a file
+    converted = False
+    try:
+        for timeStamps, averages, imputedPercs in epochConv.epochChunks(file, headerLine, epoch, daylightSavingsTime):
+            if output != None:
+                with profiler.stage("write"):
+                    output.write(epochConv.formatEpochLines(timeStamps, averages, imputedPercs))
+            # the values as they are read back from an epoch file
+            chunkValues = epochConv.writtenValues(averages, 1)
+            if skipFirst and len(chunkValues) != 0:
+                timeStamps = timeStamps[1:]
+                chunkValues = chunkValues[1:]
+                skipFirst = False
+            days = timeStamps.astype("datetime64[D]")
+            bounds = [0] + (np.flatnonzero(days[1:] != days[:-1]) + 1).tolist() + [len(days)]
+            for k in range(len(bounds) - 1):
+                if bounds[k] == bounds[k + 1]:
+                    continue
+                if currentDay != None and days[bounds[k]] != currentDay:
+                    if not startDay:
+                        if len(values) != 0:  # no values saved for the day... skip the day
+                            yield id, DayData(np.concatenate(times), np.concatenate(values))
+                    startDay = False
+                    times = []
+                    values = []
+                currentDay = days[bounds[k]]
+                times.append(timeStamps[bounds[k]:bounds[k + 1]])
+                values.append(chunkValues[bounds[k]:bounds[k + 1]])
+        converted = True
+    finally:
+        if output != None:
+            if converted:
+                with profiler.stage("write"):
+                    output.commit()
+            else:
+                output.discard()
+    if lastDay and len(values) != 0:
+        yield id, DayData(np.concatenate(times), np.concatenate(values))
 
 def readProcessedData(file, lastDay=False):
     """
     To use to read processed data files into the chronPercentile Script, i.e. files that have been created using the epochConv script
     :param file:
-    :return: a list with each row being two lists, where list 0 contains times and list 1 values whilst each row
-    represent a single day
+    :return: a list with two lists, list 0 contains the ids and list 1 the DayData of each day
+    """
+    return collectDays(iterProcessedData(file, lastDay))
+
+def iterProcessedData(file, lastDay=False):
+    """
+    Generator version of readProcessedData
+    :param file: file object from where to read the data
+    :param lastDay: whether the last day should be yielded as well
+    :return: generator of (id, DayData) tuples
     """
     print("Found processed Data in {}".format(file.name))
-    results = [[],[]]
-    result = [[],[]]
+    id = (os.path.basename(file.name)).split(".")[0]
+    times = []
+    values = []
     next(file) # skip the header line, if not done so already
-    i = 0 # day index
-    oldTime = None
-    currentTime = None
+    oldDay = None
+    currentDay = None
     startDay = True
-    for line in file:
+    lineCount = 0
+    for lineCount, line in enumerate(file, 1):
         lineParts =line.strip().split("\t")
         if len(lineParts) == 3 and lineParts[1] != -1:
-            oldTime = currentTime
-            currentTime = datetime.datetime.strptime(lineParts[0], "%Y-%m-%dT%H:%M:%S")
-            if oldTime != None and currentTime.day != oldTime.day:
+            oldDay = currentDay
+            currentDay = lineParts[0][8:10] # day of the month in YYYY-MM-DDThh:mm:ss
+            if oldDay != None and currentDay != oldDay:
                 if not startDay:
-                    if len(result[1]) != 0:  # no values saved for the day... skip the day
-                        results[0].append((os.path.basename(file.name)).split(".")[0])
-                        results[1].append(copy.deepcopy(result))
+                    if len(values) != 0:  # no values saved for the day... skip the day
+                        yield id, DayData(times, values)
                 startDay = False
-                result[0].clear()
-                result[1].clear()
-            result[0].append(currentTime)
-            result[1].append(float(lineParts[1]))
+                times = []
+                values = []
+            times.append(lineParts[0])
+            values.append(float(lineParts[1]))
         else:
             # line incomplete, discard
             pass
+    profiler.count("samples", lineCount)
     if lastDay:
-        results[0].append((os.path.basename(file.name)).split(".")[0])
-        results[1].append(copy.deepcopy(result))
-        result[0].clear()
-        result[1].clear()
-    return results
+        yield id, DayData(times, values)
+
+def hasSidecar(fileName):
+    """
+    :param fileName: path of a processed data file
+    :return: whether epochConv wrote a binary copy of the file, that is at least as new as the file itself
+    """
+    sidecarName = epochConv.getSidecarName(fileName)
+    try:
+        return os.stat(sidecarName).st_mtime >= os.stat(fileName).st_mtime
+    except OSError:
+        return False
+
+def readSidecarData(fileName, lastDay=False):
+    """
+    To use to read the binary copy epochConv writes next to a processed data file. The file is memory mapped and split
+    into the same days readProcessedData reads from the text file.
+    :param fileName: path of the processed data file
+    :return: a list with two lists, list 0 contains the ids and list 1 the DayData of each day
+    """
+    return collectDays(iterSidecarData(fileName, lastDay))
+
+def iterSidecarData(fileName, lastDay=False):
+    """
+    Generator version of readSidecarData
+    :param fileName: path of the processed data file
+    :param lastDay: whether the last day should be yielded as well
+    :return: generator of (id, DayData) tuples
+    """
+    print("Found processed Data in {}".format(fileName))
+    records = np.load(epochConv.getSidecarName(fileName), mmap_mode="r")
+    profiler.count("bytesRead", records.nbytes)
+    profiler.count("samples", len(records))
+    records = records[1:] # readProcessedData skips the first epoch of a file
+    times = records["time"]
+    values = records["value"]
+    days = times.astype("datetime64[D]")
+    bounds = [0] + (np.flatnonzero(days[1:] != days[:-1]) + 1).tolist() + [len(days)]
+    id = (os.path.basename(fileName)).split(".")[0]
+    # the first day is incomplete, as is the last one, which is only added if requested
+    for k in range(1, len(bounds) - 2):
+        yield id, DayData(times[bounds[k]:bounds[k + 1]], values[bounds[k]:bounds[k + 1]])
+    if lastDay:
+        yield id, DayData(times[bounds[-2]:], values[bounds[-2]:])
 
 def readAccelFeatureData(file):
     """
     To use to read dayactivity data files, i.e. files generated with the accelerometer into the chronPercentile Script
     :param file:
-    :return: a list with each row being two lists, where list 0 contains times and list 1 values whilst each row
-    represent a single day
+    :return: a list with two lists, list 0 contains the ids and list 1 the DayData of each day
+    """
+    return collectDays(iterAccelFeatureData(file))
+
+def iterAccelFeatureData(file):
+    """
+    Generator version of readAccelFeatureData. Only the ID, date and hourly mean columns are read, block wise with
+    featureReader. Each day is held back until the next row shows, that it is not the last day of its participant.
+    :param file: file object from where to read the data, positioned after the header
+    :return: generator of (id, DayData) tuples
     """
-    # only the mean is interesting, so load that
-    # 8 + 5*n columns until n = 23
-    # date column is the second from the left with YYYY-mm-dd
     print("Found Feature Data in {}".format(file.name))
-    users = []
-    results = [[],[]]
-    result = [[],[]]
-    i = 0
-    next(file)
-    for line in file:
-        # each line is a new day
-        i += 1
-        line = line.strip().split("\t")
-        if not line[0] in users:
-            if len(users) != 0: #new person in document, meaning the previous results entry is a last day
-                del results[0][-1]
-                del results[1][-1]
-            users.append(line[0])
-            continue
-        date = line[1].split("-")
-        for n in range(0,24):
-            if (line[8 + 5 * n] != "N/A"):
-                result[0].append(datetime.datetime(year=int(date[0]), month=int(date[1]), day= int(date[2]),hour= n, minute= 0, second= 0))
-                result[1].append(float(line[8+5*n]))
-        results[0].append(line[0])
-        results[1].append(copy.deepcopy(result))
-        result[0].clear()
-        result[1].clear()
-    del results[0][-1]
-    del results[1][-1]
-    return results
+    users = set()
+    previous = None # the last day read, it is dropped if it turns out to be the last day of a participant
+    next(file) # skip the header line, if not done so already
+    for ids, dates, means in featureReader.iterFeatureBlocks(file):
+        profiler.count("samples", means.size)
+        measured = ~np.isnan(means)
+        for k in range(len(ids)):
+            # each row is a new day
+            if not ids[k] in users:
+                # new person in document, meaning the previous day is a last day
+                previous = None
+                users.add(ids[k])
+                continue
+            if previous != None:
+                yield previous
+            hours = np.flatnonzero(measured[k])
+            previous = (ids[k], DayData(dates[k] + hours.astype("timedelta64[h]"), means[k][hours]))
 
 def loadWakeHourFile(fileName):
     wakehours = [[],[]] # id [startDatetime endDatetime]
@@ -348,15 +712,14 @@ def loadWakeHourFile(fileName):
     lastID = ""
     with open(fileName, "r") as wakeFile:
         header = wakeFile.readline()
-        if header.startswith("Filename\tDate\tWake_Time\tSleep_Date\tSleep_Time\t"):
+        if header.startswith(WAKE_HEADER):
             for line in wakeFile:
                 lineparts = line.strip().split("\t")
                 newID = lineparts[0].strip().split("_")[0]
                 if (newID != lastID )and( lastID != ""):
                     wakehours[0].append(int(lastID))
-                    wakehours[1].append(copy.deepcopy(hours))
-                    hours[0].clear()
-                    hours[1].clear()
+                    wakehours[1].append(hours)
+                    hours = [[],[]]
                 wakeTimeStr = lineparts[1] + " "+ lineparts [2]
                 sleepTimeStr = lineparts[3] + " " + lineparts[4]
                 wakeTime = datetime.datetime.strptime(wakeTimeStr, "%d/%m/%Y %H:%M:%S")
@@ -364,8 +727,600 @@ def loadWakeHourFile(fileName):
                 hours[0].append(wakeTime)
                 hours[1].append(sleepTime)
                 lastID = newID
+            if lastID != "":
+                wakehours[0].append(int(lastID))
+                wakehours[1].append(hours)
     return wakehours
 
+def toISOTime(date, time):
+    """
+    Converts the date and time of a wake file into a ISO 8601 time string
+    :param date: date in the format DD/MM/YYYY
+    :param time: time in the format HH:MM:SS
+    :return: the time as YYYY-MM-DDTHH:MM:SS
+    """
+    day, month, year = date.split("/")
+    hour, minute, second = time.split(":")
+    return "{}-{:0>2}-{:0>2}T{:0>2}:{:0>2}:{:0>2}".format(year, month, day, hour, minute, second)
+
+def parseWakeIndex(fileName):
+    """
+    Reads a wake file into a wake period index, see loadWakeIndex.
+    :param fileName: path of the wake file
+    :return: dictionary of the participant id (int) to a numpy array of [start, end] rows in seconds, sorted by start
+    """
+    ids = []
+    wakeTimes = []
+    sleepTimes = []
+    with open(fileName, "r") as wakeFile:
+        header = wakeFile.readline()
+        if header.startswith(WAKE_HEADER):
+            for line in wakeFile:
+                lineparts = line.strip().split("\t")
+                ids.append(int(lineparts[0].strip().split("_")[0]))
+                wakeTimes.append(toISOTime(lineparts[1], lineparts[2]))
+                sleepTimes.append(toISOTime(lineparts[3], lineparts[4]))
+    ids = np.array(ids, dtype=np.int64)
+    periods = np.stack([np.array(wakeTimes, dtype="datetime64[s]").astype(np.int64),
+                        np.array(sleepTimes, dtype="datetime64[s]").astype(np.int64)], axis=1).reshape(-1, 2)
+    # sort by id and start, the sort is stable so equal starts keep the order of the file
+    order = np.lexsort((periods[:, 0], ids))
+    ids = ids[order]
+    periods = periods[order]
+    uniqueIds, firsts = np.unique(ids, return_index=True)
+    bounds = np.append(firsts, len(ids))
+    return {int(uniqueIds[k]): periods[bounds[k]:bounds[k + 1]] for k in range(len(uniqueIds))}
+
+def readWakeCache(cacheName, fileStat):
+    """
+    Reads a wake period index written by writeWakeCache, if it belongs to the current version of the wake file.
+    :param cacheName: path of the cache file
+    :param fileStat: os.stat result of the wake file
+    :return: the wake period index, or None if there is no matching cache
+    """
+    try:
+        with np.load(cacheName) as cache:
+            if int(cache["sourceSize"]) != fileStat.st_size or int(cache["sourceMtime"]) != fileStat.st_mtime_ns:
+                return None
+            ids = cache["ids"]
+            bounds = cache["bounds"]
+            periods = cache["periods"]
+    except (OSError, ValueError, KeyError):
+        return None
+    return {int(ids[k]): periods[bounds[k]:bounds[k + 1]] for k in range(len(ids))}
+
+def writeWakeCache(cacheName, fileStat, wakeIndex):
+    """
+    Stores a wake period index next to its wake file, together with the size and modification time of the wake file.
+    :param cacheName: path of the cache file
+    :param fileStat: os.stat result of the wake file
+    :param wakeIndex: the wake period index
+    :return: none
+    """
+    ids = sorted(wakeIndex)
+    bounds = np.cumsum([0] + [len(wakeIndex[id]) for id in ids])
+    periods = np.concatenate([wakeIndex[id] for id in ids]) if ids else np.zeros((0, 2), dtype=np.int64)
+    try:
+        with open(cacheName + ".part", "wb") as cacheFile:
+            np.savez(cacheFile, sourceSize=fileStat.st_size, sourceMtime=fileStat.st_mtime_ns,
+                     ids=np.array(ids, dtype=np.int64), bounds=bounds, periods=periods)
+        os.replace(cacheName + ".part", cacheName)
+    except OSError:
+        print("Could not write wake cache {}".format(cacheName))
+
+def loadWakeIndex(fileName, useCache=False):
+    """
+    Loads a wake file into a wake period index, a dictionary of the participant id to its wake periods, presorted by
+    their start. If useCache is set, the index is stored in a binary sidecar file next to the wake file and reused
+    by later runs, as long as the size and modification time of the wake file did not change.
+    :param fileName: path of the wake file
+    :param useCache: whether to read and write the sidecar file
+    :return: dictionary of the participant id (int) to a numpy array of [start, end] rows in seconds
+    """
+    fileStat = os.stat(fileName)
+    cacheName = fileName + WAKE_CACHE_EXTENSION
+    if useCache:
+        wakeIndex = readWakeCache(cacheName, fileStat)
+        if wakeIndex != None:
+            return wakeIndex
+    wakeIndex = parseWakeIndex(fileName)
+    if useCache:
+        writeWakeCache(cacheName, fileStat, wakeIndex)
+    return wakeIndex
+
+def getPercentages(values):
+    """
+    :param values: percentiles as fractions of 1 or as values in the range 1-100
+    :return: list of the percentiles as fractions between 0 and 1
+    """
+    percentages = []
+    for value in values: # values need to be between 0 and 1, so we may need to convert them.
+        if float(value) > 1: # assume XX.XX... [%] writing, divide by 100
+            percentages.append(round(abs(float(value))/100, 8))
+        else:
+            percentages.append(round(abs(float(value)), 8))
+    return percentages
+
+def formatResults(results, asTime):
+    """
+    Formats results as lines of the output table
+    :param results: list of three lists, the ids, the dates and the percentile results of each day
+    :param asTime: whether the percentile results are times, that should be formatted as HH:MM:SS
+    :return: the output lines as one string
+    """
+    resultString = ""
+    for i in range(len(results[0])):
+        # for every day dataset
+        resultString += ("{}\t{}".format(results[0][i], results[1][i]))
+
+        for percentage in results[2][i]:
+            try:
+                if asTime:
+                    resultString += ("\t{}".format((datetime.datetime.strftime(percentage, "%H:%M:%S"))if percentage != "NA"  and isinstance(percentage, datetime.datetime) else "NA"))
+                else:
+                    resultString += ("\t{}".format(percentage))
+            except TypeError:
+                resultString += "NA"
+        resultString += ("\n")
+    return resultString
+
+def iterFileProfiles(fileName, wakeInfo=None, epoch=None, daylightSavingsTime=False, teeDir=None):
+    """
+    Reads a file and computes the profiles of all of its days, or with wake data of all of its participants. The
+    profiles contain everything needed to find any percentile, see getDayProfile and getWakeProfile. Days are read and
+    profiled one at a time, only wake periods need all days of a file, as they can span the days of a participant.
+    :param fileName: the file to read
+    :param wakeInfo: wake period index as returned by loadWakeIndex, if only wake hours should be considered
+    :param epoch: epoch in seconds raw data is averaged to before the analysis, None to analyze it as it is
+    :param daylightSavingsTime: whether raw data averaged to an epoch gets daylight savings time adjusted timestamps
+    :param teeDir: directory to also write the averaged epoch files to, None to not write them
+    :return: generator of (id, profile) tuples
+    """
+    days = profiler.timedIter(iterData(fileName, wakeInfo != None, epoch, daylightSavingsTime, teeDir), "parse")
+    if wakeInfo == None:
+        for id, day in days:
+            profiler.count("measurements", len(day))
+            with profiler.stage("profile"):
+                profile = getDayProfile(day)
+            yield id, profile
+        return
+    data = collectDays(days)
+    profiler.count("measurements", sum(len(day) for day in data[1]))
+    with profiler.stage("wakeLookup"):
+        activePeriods = getActivePeriodIndex(data)
+    for id in dict.fromkeys(data[0]): # every participant once, in order of appearance
+        with profiler.stage("profile"):
+            profile = getWakeProfile(data, id, wakeInfo, activePeriods)
+        yield id, profile
+
+def processFile(fileName, percentages, asTime, precision, wakeInfo=None, epoch=None, daylightSavingsTime=False,
+                teeDir=None, cache=None, summarize=False):
+    """
+    Reads a file and calculates the percentiles of all of its days, the work main does for every input file.
+    :param fileName: the file to process
+    :param percentages: list of percentages to record the times for
+    :param asTime: whether the results should be times instead of percentages
+    :param precision: how close a value needs to match a given percentage
+    :param wakeInfo: wake period index as returned by loadWakeIndex, if only wake hours should be considered
+    :param epoch: epoch in seconds raw data is averaged to before the analysis, None to analyze it as it is
+    :param daylightSavingsTime: whether raw data averaged to an epoch gets daylight savings time adjusted timestamps
+    :param teeDir: directory to also write the averaged epoch files to, None to not write them
+    :param cache: ProfileCache to take the profiles of the file from instead of reading it, None to always read it
+    :param summarize: whether the results should be returned as well, to be added to a cohortSummary.CohortSummary
+    :return: list of (id, output lines, results) tuples. With wake data there is one tuple per participant in the order
+    they appear in the file, so that main can skip participants it has already seen, otherwise one tuple with the id
+    None. The results are a list of (date, list of results) tuples of the days, None if summarize is False.
+    """
+    wakeHourCalc = wakeInfo != None
+    profiles = None
+    if cache != None:
+        key = cache.getKey(fileName, epoch, daylightSavingsTime)
+        if teeDir == None: # the epoch file can only be written by reading the file
+            with profiler.stage("cache"):
+                profiles = cache.load(key)
+            profiler.count("cacheHits", profiles != None)
+    if profiles == None:
+        profiles = iterFileProfiles(fileName, wakeInfo, epoch, daylightSavingsTime, teeDir)
+        if cache != None: # the profiles of the whole file are needed to store them
+            profiles = list(profiles)
+            with profiler.stage("cache"):
+                cache.store(key, profiles, wakeHourCalc)
+    if not wakeHourCalc:
+        results = [[], [], []]
+        for id, profile in profiles:
+            with profiler.stage("percentiles"):
+                percentileResults = dayPercentiles(profile, percentages, not(asTime),precision) # give it one day of data
+            results[0].append(id) # add id
+            results[1].append(getProfileDate(profile)) # append date from the first element in the data set
+            results[2].append(percentileResults)
+        with profiler.stage("format"):
+            return [(None, formatResults(results, asTime), list(zip(results[1], results[2])) if summarize else None)]
+    return [getWakeEntry(id, profile, percentages, asTime, precision, summarize) for id, profile in profiles]
+
+def getWakeEntry(id, profile, percentages, asTime, precision, summarize=False):
+    """
+    Calculates the percentiles of the wake periods of a participant, see processFile.
+    :param id: the participant id
+    :param profile: the profile of the participant as returned by getWakeProfile, None if it has no wake periods
+    :return: tuple of (id, output lines, results) as processFile returns it
+    """
+    results = [[], [], []]
+    with profiler.stage("percentiles"):
+        percentileResults = wakePercentiles(profile, percentages, not(asTime), precision) if profile != None else []
+    for i in range(len(percentileResults)):
+        results[2].append(percentileResults[i][1])
+        results[1].append(percentileResults[i][0])
+        results[0].append(id)
+    with profiler.stage("format"):
+        return id, formatResults(results, asTime), list(zip(results[1], results[2])) if summarize else None
+
+def concatenateArrays(arrays, dtype):
+    """
+    :param arrays: list of one dimensional arrays
+    :param dtype: dtype of the result
+    :return: tuple of the concatenated arrays and the index each array starts at, followed by the total length
+    """
+    bounds = np.zeros(len(arrays) + 1, dtype=np.int64)
+    bounds[1:] = np.cumsum([len(array) for array in arrays], dtype=np.int64)
+    if not arrays:
+        return np.zeros(0, dtype=dtype), bounds
+    return np.concatenate(arrays).astype(dtype, copy=False), bounds
+
+def packProfiles(profiles, wake):
+    """
+    Converts the profiles of a file into flat arrays, that can be stored with numpy.savez.
+    :param profiles: the profiles as yielded by iterFileProfiles
+    :param wake: whether the profiles are wake period profiles
+    :return: dictionary of array names to arrays
+    """
+    arrays = {"ids": np.array([id for id, profile in profiles], dtype=str), "wake": np.array(wake)}
+    if not wake:
+        arrays["seconds"], arrays["bounds"] = concatenateArrays([profile[0] for id, profile in profiles], np.int64)
+        arrays["percents"] = concatenateArrays([profile[1] for id, profile in profiles], np.float64)[0]
+        arrays["states"] = np.array([profile[2] for id, profile in profiles], dtype=np.int64)
+        return arrays
+    found = [profile for id, profile in profiles if profile != None]
+    arrays["found"] = np.array([profile != None for id, profile in profiles], dtype=bool)
+    arrays["seconds"], arrays["bounds"] = concatenateArrays([profile[0] for profile in found], np.int64)
+    arrays["lastOpen"] = np.array([profile[2] for profile in found], dtype=bool)
+    periods = [(owner, start, end, first, state) for owner in range(len(found))
+               for start, end, first, state, percents in found[owner][1]]
+    arrays["periods"] = np.array(periods, dtype=np.int64).reshape(len(periods), 5)
+    arrays["percents"], arrays["periodBounds"] = concatenateArrays(
+        [period[4] for profile in found for period in profile[1]], np.float64)
+    return arrays
+
+def unpackProfiles(arrays):
+    """
+    Restores the profiles of a file from the arrays created by packProfiles.
+    :param arrays: dictionary like object of array names to arrays
+    :return: the profiles as yielded by iterFileProfiles
+    """
+    ids = arrays["ids"].tolist()
+    seconds = arrays["seconds"]
+    bounds = arrays["bounds"]
+    percents = arrays["percents"]
+    if not arrays["wake"]:
+        states = arrays["states"]
+        return [(ids[k], (seconds[bounds[k]:bounds[k + 1]], percents[bounds[k]:bounds[k + 1]], int(states[k])))
+                for k in range(len(ids))]
+    lastOpen = arrays["lastOpen"]
+    periodBounds = arrays["periodBounds"]
+    found = [(seconds[bounds[k]:bounds[k + 1]], [], bool(lastOpen[k])) for k in range(len(lastOpen))]
+    for n, (owner, start, end, first, state) in enumerate(arrays["periods"].tolist()):
+        found[owner][1].append((start, end, first, state, percents[periodBounds[n]:periodBounds[n + 1]]))
+    found.reverse()
+    return [(ids[k], found.pop() if present else None) for k, present in enumerate(arrays["found"].tolist())]
+
+def getFileKey(fileName):
+    """
+    :param fileName: path of a file
+    :return: list of the path, size and modification time, that identifies the contents of the file
+    """
+    stat = os.stat(fileName)
+    return [os.path.realpath(fileName), stat.st_size, stat.st_mtime_ns]
+
+class ProfileCache:
+    """
+    Directory of the profiles of already processed files, one file per input file and settings, so that runs with
+    other percentiles or precisions do not need to read the input files again. Files are identified by their path,
+    size and modification time. If the cache grows beyond its size limit, the least recently used entries are removed.
+    """
+
+    def __init__(self, directory, maxSize=PROFILE_CACHE_SIZE * 1024 * 1024, wakeFile=None):
+        """
+        :param directory: the cache directory, it is created if necessary
+        :param maxSize: size limit of the cache in bytes
+        :param wakeFile: path of the wake file, if only wake hours are considered
+        """
+        self.directory = os.path.realpath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.maxSize = maxSize
+        self.wakeKey = getFileKey(wakeFile) if wakeFile != None else None
+        self.size = None # estimated size of the cache, determined by the first call of store
+
+    def getKey(self, fileName, epoch=None, daylightSavingsTime=False):
+        """
+        :param fileName: path of an input file
+        :param epoch: epoch in seconds raw data is averaged to, see processFile
+        :param daylightSavingsTime: whether raw data averaged to an epoch gets daylight savings time adjusted timestamps
+        :return: the cache key of the profiles of the file
+        """
+        key = [PROFILE_CACHE_VERSION, getFileKey(fileName), self.wakeKey, epoch, daylightSavingsTime]
+        return hashlib.sha1(json.dumps(key).encode("utf-8")).hexdigest()
+
+    def getPath(self, key):
+        return os.path.join(self.directory, key + PROFILE_CACHE_EXTENSION)
+
+    def load(self, key):
+        """
+        :param key: cache key as returned by getKey
+        :return: the cached profiles, None if there are none
+        """
+        path = self.getPath(key)
+        try:
+            with np.load(path, allow_pickle=False) as arrays:
+                profiles = unpackProfiles(arrays)
+            os.utime(path) # mark the entry as recently used
+        except (OSError, ValueError, KeyError):
+            return None
+        return profiles
+
+    def store(self, key, profiles, wake):
+        """
+        Adds the profiles of a file to the cache and removes old entries if the size limit is exceeded.
+        :param key: cache key as returned by getKey
+        :param profiles: the profiles as yielded by iterFileProfiles
+        :param wake: whether the profiles are wake period profiles
+        :return: none
+        """
+        path = self.getPath(key)
+        # the temporary name is unique to the process, as workers of a parallel run share the cache
+        tempPath = "{}.{}.part".format(path, os.getpid())
+        with open(tempPath, "wb") as file:
+            np.savez(file, **packProfiles(profiles, wake))
+        os.replace(tempPath, path)
+        if self.size == None:
+            self.evict()
+        else:
+            self.size += os.path.getsize(path)
+            if self.size > self.maxSize:
+                self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits its size limit.
+        :return: none
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(PROFILE_CACHE_EXTENSION):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue # removed by another process
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        self.size = sum(entry[1] for entry in entries)
+        for mtime, size, path in entries:
+            if self.size <= self.maxSize:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.size -= size
+
+class ParticipantStore:
+    """
+    The measurements of all participants of a file in one block of shared memory, so that the worker processes of a
+    parallel run read them without copying. The block holds the bounds of the participants, their ids, the times and
+    the values one after the other, participant k owns the times and values from bounds[k] to bounds[k + 1].
+    """
+
+    def __init__(self, memory, participants, measurements):
+        """
+        Maps the arrays onto a block of shared memory, use create or attach instead.
+        :param memory: the SharedMemory block
+        :param participants: number of participants
+        :param measurements: number of measurements of all participants together
+        """
+        self.memory = memory
+        offset = 0
+        arrays = []
+        for dtype, length in ((np.int64, participants + 1), (np.int64, participants),
+                              ("datetime64[s]", measurements), (np.float32, measurements)):
+            arrays.append(np.ndarray(length, dtype=dtype, buffer=memory.buf, offset=offset))
+            offset += arrays[-1].nbytes
+        self.bounds, self.ids, self.times, self.values = arrays
+        self.index = {int(self.ids[k]): k for k in range(participants)}
+
+    @staticmethod
+    def getSize(participants, measurements):
+        """
+        :return: size of the block of shared memory in bytes
+        """
+        return 8 * (2 * participants + 1) + 12 * measurements
+
+    @staticmethod
+    def create(activePeriods):
+        """
+        Copies the measurements of all participants into a new block of shared memory.
+        :param activePeriods: the measurements of every participant, see getActivePeriodIndex
+        :return: the ParticipantStore, its memory needs to be released with close and unlink
+        """
+        ids = list(activePeriods)
+        lengths = [len(activePeriods[id]) for id in ids]
+        measurements = sum(lengths)
+        from multiprocessing import shared_memory # only needed by --shared runs, imported on demand
+        # a block can not be empty
+        memory = shared_memory.SharedMemory(create=True, size=max(ParticipantStore.getSize(len(ids), measurements), 1))
+        store = ParticipantStore(memory, len(ids), measurements)
+        store.bounds[0] = 0
+        store.bounds[1:] = np.cumsum(lengths)
+        store.ids[:] = ids
+        for k in range(len(ids)):
+            store.times[store.bounds[k]:store.bounds[k + 1]] = activePeriods[ids[k]].times
+            store.values[store.bounds[k]:store.bounds[k + 1]] = activePeriods[ids[k]].values
+        store.index = {int(ids[k]): k for k in range(len(ids))}
+        return store
+
+    @staticmethod
+    def attach(handle):
+        """
+        :param handle: the handle of a store as returned by getHandle
+        :return: the ParticipantStore using the existing block of shared memory
+        """
+        from multiprocessing import resource_tracker, shared_memory
+        name, participants, measurements = handle
+        # the block belongs to the process that created it, the resource tracker of an attached process must not
+        # remove it or warn about it once the process ends
+        try:
+            memory = shared_memory.SharedMemory(name=name, track=False) # python 3.13 and newer
+        except TypeError:
+            memory = shared_memory.SharedMemory(name=name)
+            if os.name == "posix": # only posix blocks are tracked, under their public name with a leading "/"
+                resource_tracker.unregister("/" + name, "shared_memory")
+        return ParticipantStore(memory, participants, measurements)
+
+    def getHandle(self):
+        """
+        :return: what attach needs to find the store in another process, the public name of the block of shared
+        memory and the number of participants and measurements
+        """
+        return self.memory.name, len(self.ids), len(self.values)
+
+    def get(self, id, default=None):
+        """
+        The measurements of a participant, like the index of getActivePeriodIndex
+        :param id: the participant id (int)
+        :param default: returned for unknown participants
+        :return: DayData of views into the shared memory
+        """
+        k = self.index.get(id)
+        if k == None:
+            return default
+        start, end = int(self.bounds[k]), int(self.bounds[k + 1])
+        return DayData(self.times[start:end], self.values[start:end])
+
+    def close(self):
+        """
+        Detaches the process from the shared memory, views into it must not be used anymore.
+        :return: none
+        """
+        self.bounds = self.ids = self.times = self.values = None
+        self.memory.close()
+
+    def unlink(self):
+        """
+        Frees the shared memory, once every process closed it.
+        :return: none
+        """
+        self.memory.unlink()
+
+def processShared(fileName, pool, jobs, percentages, asTime, precision, wakeInfo, epoch=None, daylightSavingsTime=False,
+                  teeDir=None, summarize=False):
+    """
+    processFile for a run with --shared. The file is read once and the measurements of its participants are placed in
+    a ParticipantStore, the workers of the pool then calculate the percentiles of the participants chunk wise.
+    :param fileName: the file to process
+    :param pool: the multiprocessing.Pool, its workers initialized with initWorker
+    :param jobs: number of workers of the pool
+    :return: the entries as processFile returns them, with wake data, and the console output of the workers
+    """
+    data = collectDays(profiler.timedIter(iterData(fileName, True, epoch, daylightSavingsTime, teeDir), "parse"))
+    ids = list(dict.fromkeys(data[0])) # every participant once, in order of appearance
+    with profiler.stage("share"):
+        store = ParticipantStore.create(getActivePeriodIndex(data))
+    profiler.count("measurements", len(store.values))
+    del data # only the shared copy is needed from now on
+    chunkSize = max(1, math.ceil(len(ids) / (jobs * SHARED_CHUNKS)))
+    tasks = [(store.getHandle(), ids[k:k + chunkSize]) for k in range(0, len(ids), chunkSize)]
+    entries = []
+    output = ""
+    try:
+        for chunkEntries, chunkOutput in pool.imap(processParticipantsTask, tasks):
+            entries.extend(chunkEntries)
+            output += chunkOutput
+    finally:
+        store.close()
+        store.unlink()
+    return entries, output
+
+def processParticipantsTask(task):
+    """
+    Calculates the percentiles of the wake periods of a chunk of participants in a worker process of a --shared run.
+    The worker stays attached to the ParticipantStore of a file until it gets the participants of the next file.
+    :param task: tuple of the handle of the ParticipantStore and the list of participant ids
+    :return: tuple of the entries of the participants, see processFile, and the console output
+    """
+    global WORKER_STORE
+    handle, ids = task
+    if WORKER_STORE == None or WORKER_STORE.memory.name != handle[0]:
+        if WORKER_STORE != None:
+            WORKER_STORE.close()
+        WORKER_STORE = ParticipantStore.attach(handle)
+    settings, profile = WORKER_SETTINGS
+    percentages, asTime, precision, wakeInfo = settings[:4]
+    summarize = settings[-1]
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        entries = [getWakeEntry(id, getWakeProfile(None, id, wakeInfo, WORKER_STORE), percentages, asTime, precision,
+                                summarize) for id in ids]
+    return entries, output.getvalue()
+
+def profileShared(fileName, pool, jobs, settings, profile=False):
+    """
+    Runs processShared, optionally measuring the part of the main process with the profiler.
+    :param fileName: the file to process
+    :param pool: the multiprocessing.Pool, its workers initialized with initWorker
+    :param jobs: number of workers of the pool
+    :param settings: the arguments of processFile following the file name
+    :param profile: whether the file should be profiled
+    :return: tuple of the entries, the report of the profiler, None if the file was not profiled, and the console
+    output of the workers
+    """
+    percentages, asTime, precision, wakeInfo, epoch, daylightSavingsTime, teeDir, cache, summarize = settings
+    with profiler.profile(fileName) if profile else contextlib.nullcontext() as fileProfile:
+        entries, output = processShared(fileName, pool, jobs, percentages, asTime, precision, wakeInfo, epoch,
+                                        daylightSavingsTime, teeDir, summarize)
+    return entries, fileProfile.report() if fileProfile != None else None, output
+
+def profileFile(fileName, settings, profile=False):
+    """
+    Runs processFile, optionally measuring it with the profiler.
+    :param fileName: the file to process
+    :param settings: the arguments of processFile following the file name
+    :param profile: whether the file should be profiled
+    :return: tuple of the result of processFile and the report of the profiler, None if the file was not profiled
+    """
+    if not profile:
+        return processFile(fileName, *settings), None
+    with profiler.profile(fileName) as fileProfile:
+        entries = processFile(fileName, *settings)
+    return entries, fileProfile.report()
+
+def initWorker(profile, *settings):
+    """
+    Initializes a worker process of a parallel run with the settings shared by all files, so they are only sent once.
+    :param profile: whether the files should be profiled
+    :param settings: the arguments of processFile following the file name
+    :return: none
+    """
+    global WORKER_SETTINGS
+    WORKER_SETTINGS = (settings, profile)
+
+def processFileTask(fileName):
+    """
+    Runs processFile in a worker process, capturing its console output so it can be printed in order by main.
+    :param fileName: the file to process
+    :return: tuple of the result of processFile, the report of the profiler and the console output
+    """
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        entries, report = profileFile(fileName, *WORKER_SETTINGS)
+    return entries, report, output.getvalue()
+
 def main():
     """
     Overall management of the chronPercentile Conversion
@@ -380,16 +1335,44 @@ def main():
     parser.add_argument("-o", nargs="?", type=str, dest="out", const="", help="output location")
     parser.add_argument("-p", nargs="?", type=float, dest="precision", const="0.05", help="precision for time approximation")
     parser.add_argument("-t", action='store_true', dest="asTime", help="Flag to format the output as HH:MM:SS instead of a percentage of the awaken day")
+    parser.add_argument("--wake-cache", action="store_true", dest="wakeCache", help="Store the parsed wake file in a "
+                        "binary file next to it ([wake file].npz) and reuse it in later runs")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes reading and analyzing files "
+                                                            "in parallel. 0 uses all available cores.")
+    parser.add_argument("-e", type=int, dest="epoch", help="Average raw data to this epoch in seconds, as epochConv "
+                        "would, and analyze the averages directly without writing intermediate files")
+    parser.add_argument("-d", action="store_true", dest="dst", help="Adjust the timestamps of raw data averaged with "
+                        "-e for daylight saving time")
+    parser.add_argument("--tee", type=str, dest="tee", help="Directory to also write the epoch files of raw data "
+                        "averaged with -e to, it is created if it does not exist")
+    parser.add_argument("--cache", type=str, dest="cache", help="Directory to keep the daily activity profiles of the "
+                        "analyzed files in, so that later runs with other percentiles or precisions do not read them "
+                        "again")
+    parser.add_argument("--cache-size", type=int, default=PROFILE_CACHE_SIZE, dest="cacheSize", help="Size limit of "
+                        "the cache directory in MB, the least recently used profiles are removed beyond it")
+    parser.add_argument("--profile", type=str, metavar="FILE", help="Measure the time spent in every stage of the "
+                        "analysis and write a JSON report of every file and of all files together to FILE")
+    parser.add_argument("--summary", type=str, metavar="FILE", help="Fold the results of every day into histograms "
+                        "and write them to FILE, see cohortSummary")
+    parser.add_argument("--group-by", nargs="+", choices=cohortSummary.GROUP_KEYS, default=["all"], dest="groupBy",
+                        help="Keys to group the days of the summary by, default all")
+    parser.add_argument("--bins", type=int, default=cohortSummary.DEFAULT_BINS, help="Number of bins of the summary "
+                        "histograms, default {} (one per minute)".format(cohortSummary.DEFAULT_BINS))
+    parser.add_argument("--shared", action="store_true", help="Read every file once and share the measurements of its "
+                        "participants with the --jobs worker processes through shared memory, which calculate the "
+                        "percentiles of the participants in parallel. Needs a wake file.")
     args = parser.parse_args()
+    if args.epoch != None and (args.epoch % epochConv.EPOCH_TIME != 0 or args.epoch < epochConv.EPOCH_TIME):
+        print("ERROR: the epoch needs to be a multiple of {} seconds".format(epochConv.EPOCH_TIME))
+        return
+    if args.shared and (args.wakeFile == "" or args.wakeFile == None or args.cache != None):
+        print("ERROR: --shared needs a wake file (-w) and can not be combined with --cache")
+        return
+    if args.tee != None:
+        os.makedirs(args.tee, exist_ok=True)
     fileList = []
     precision = args.precision if args.precision != None else 0.05
-    # check percentage level input
-    percentages = []
-    for value in args.percentiles: # values need to be between 0 and 1, so we may need to convert them.
-        if float(value) > 1: # assume XX.XX... [%] writing, divide by 100
-            percentages.append(round(abs(float(value))/100, 8))
-        else:
-            percentages.append(round(abs(float(value)), 8))
+    percentages = getPercentages(args.percentiles)
     if os.path.isfile(os.path.abspath(args.inlis)) and args.inlis.endswith(ALLOWED_EXTENSIONS):
         # only one file to look at
         fileList.append(os.path.abspath(args.inlis))
@@ -406,62 +1389,77 @@ def main():
     for percentage in percentages:
         outText += "\t{}".format(percentage)
     outText += "\n"
+    outFile = None
     if args.out != None:  # we need to save
-        with open(os.path.abspath(args.out), "w") as outFile:
-            outFile.write(outText)
+        outFile = open(os.path.abspath(args.out), "w")
+        outFile.write(outText)
     else:
         print(outText)
 
     #calculate results
-    wakeHourCalc = False
-    ids = []
+    runProfile = profiler.Profile("run") # work outside of the files, which are profiled on their own
+    wakeInfo = None
     if args.wakeFile != "" and args.wakeFile != None:
-        wakeHourCalc = True
-    if wakeHourCalc:
-        wakeInfo = loadWakeHourFile(args.wakeFile)
-    for fileName in fileList:
-        results = [[], [], []]
-        data = readData(fileName, wakeHourCalc)
-        for i in range(len(data[1])):
-            if not wakeHourCalc:
-
-                percentileResults = chronPercentileDay(data[1][i], percentages, not(args.asTime),precision) # give it one day of data
-                results[0].append(data[0][i]) # add id
-                results[1].append(data[1][i][0][0].strftime("%Y-%m-%d")) # append date from the first element in the data set
-                results[2].append(percentileResults)
-            else:
-                if data[0][i] in ids:
-                    print("id duplicate" + data[0][i])
-                    continue
-                percentileResults = wakeChronoPerc(data, data[0][i], percentages, wakeInfo, not(args.asTime), precision)
-                for i in range(len(percentileResults)):
-                    results[2].append(percentileResults[i][1])
-                    results[1].append(percentileResults[i][0])
-                    results[0].append(data[0][i])
-                ids.append(data[0][i])
-
-        # output
-        # write data
-        resultString = ""
-        for i in range(len(results[0])):
-            # for every day dataset
-            resultString += ("{}\t{}".format(results[0][i], results[1][i]))
-
-            for percentage in results[2][i]:
-                try:
-                    if args.asTime:
-                        resultString += ("\t{}".format((datetime.datetime.strftime(percentage, "%H:%M:%S"))if percentage != "NA"  and isinstance(percentage, datetime.datetime) else "NA"))
-                    else:
-                        resultString += ("\t{}".format(percentage))
-                except TypeError:
-                    resultString += "NA"
-            resultString += ("\n")
-
-        if args.out != None: # we need to save
-            with open(os.path.abspath(args.out), "a") as outFile:
-                outFile.write(resultString)
+        with runProfile.stage("wakeLoad"):
+            wakeInfo = loadWakeIndex(args.wakeFile, args.wakeCache)
+    cache = None
+    if args.cache != None:
+        cache = ProfileCache(args.cache, args.cacheSize * 1024 * 1024, args.wakeFile if wakeInfo != None else None)
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    ids = set()
+    pool = None
+    reports = []
+    summary = None
+    if args.summary != None:
+        summary = cohortSummary.CohortSummary(percentages, cohortSummary.UNIT_TIME if args.asTime else
+                                              cohortSummary.UNIT_FRACTION, args.groupBy, args.bins)
+    settings = (percentages, args.asTime, precision, wakeInfo, args.epoch, args.dst, args.tee, cache, summary != None)
+    try:
+        if args.shared:
+            # the participants of a file are spread over the workers, instead of the files
+            pool = multiprocessing.Pool(jobs, initWorker, (False,) + settings)
+            fileResults = (profileShared(fileName, pool, jobs, settings, args.profile != None) for fileName in fileList)
+        elif jobs > 1:
+            pool = multiprocessing.Pool(min(jobs, max(len(fileList), 1)), initWorker, (args.profile != None,) + settings)
+            # imap returns the results in the order of fileList, so the output equals the one of a serial run
+            fileResults = pool.imap(processFileTask, fileList)
         else:
-            print(resultString)
+            fileResults = (profileFile(fileName, settings, args.profile != None) + ("",) for fileName in fileList)
+        for entries, report, output in fileResults:
+            print(output, end="")
+            if report != None:
+                reports.append(report)
+            # output
+            # write data
+            resultString = ""
+            for id, text, days in entries:
+                if id != None:
+                    if id in ids:
+                        print("id duplicate" + id)
+                        continue
+                    ids.add(id)
+                resultString += text
+                if summary != None:
+                    for date, results in days:
+                        summary.add(date, results)
+            with runProfile.stage("write"):
+                if outFile != None: # we need to save
+                    outFile.write(resultString)
+                else:
+                    print(resultString)
+    finally:
+        if pool != None:
+            pool.close()
+            pool.join()
+        if outFile != None:
+            outFile.close()
+    if summary != None:
+        with runProfile.stage("summary"):
+            summary.save(args.summary)
+    if args.profile != None:
+        runProfile.count("files", len(fileList))
+        runProfile.count("jobs", min(jobs, max(len(fileList), 1)))
+        profiler.writeReport(args.profile, runProfile.report(), reports)
 
 
 
@@ -0,0 +1,247 @@
+"""
+Cohort level distributions of the chronPercentile results. The results of every day are folded into fixed bin
+histograms, grouped e.g. by weekday or month, so a summary of any number of days takes the same small space. Summaries
+with the same settings can be merged exactly, e.g. the ones of several runs or of shards of a cohort.
+"""
+
+import argparse
+import datetime
+import os
+import numpy as np
+
+SUMMARY_VERSION = 1 # stored in every summary file, to be increased whenever the format changes
+DEFAULT_BINS = 1440 # one bin per minute of the day
+DAYSECONDS = 86400
+GROUP_KEYS = ("all", "weekday", "month", "year")
+GROUP_SEPARATOR = "/" # between the parts of a group name, if grouped by several keys
+UNIT_TIME = "time" # results are times of the day, stored as fraction of the day
+UNIT_FRACTION = "fraction" # results are fractions of the day or wake period
+DEFAULT_QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+
+def getGroup(date, groupBy):
+    """
+    :param date: date of a result as YYYY-MM-DD
+    :param groupBy: list of the keys to group by, see GROUP_KEYS
+    :return: name of the group of the date, e.g. "Monday" or "Monday/March"
+    """
+    day = datetime.datetime.strptime(date, "%Y-%m-%d")
+    parts = []
+    for key in groupBy:
+        if key == "weekday":
+            parts.append(day.strftime("%A"))
+        elif key == "month":
+            parts.append(day.strftime("%B"))
+        elif key == "year":
+            parts.append(day.strftime("%Y"))
+        else:
+            parts.append("all")
+    return GROUP_SEPARATOR.join(parts)
+
+
+def toFraction(value):
+    """
+    :param value: a result of chronPercentile, a datetime, a percentage or "NA"/None if there is none
+    :return: the result as fraction of the day or wake period, NaN if there is none
+    """
+    if isinstance(value, datetime.datetime):
+        return (value.hour * 3600 + value.minute * 60 + value.second) / DAYSECONDS
+    if isinstance(value, (float, int)):
+        return float(value)
+    return np.nan
+
+
+class CohortSummary:
+    """
+    Fixed bin histograms of the results of every percentile, one set per group. Each histogram divides the range 0 to 1
+    of the fractions of the day or wake period into the same number of bins, so histograms of the same settings add up.
+    """
+
+    def __init__(self, percentiles, unit, groupBy=("all",), bins=DEFAULT_BINS):
+        """
+        :param percentiles: list of the percentiles the results belong to
+        :param unit: UNIT_TIME or UNIT_FRACTION
+        :param groupBy: list of the keys to group the days by, see GROUP_KEYS
+        :param bins: number of bins of every histogram
+        """
+        self.percentiles = [float(percentile) for percentile in percentiles]
+        self.unit = unit
+        self.groupBy = list(groupBy)
+        self.bins = int(bins)
+        self.counts = {} # group name to (percentiles x bins) array of the number of results in every bin
+        self.missing = {} # group name to array of the number of days without a result, per percentile
+        self.groupCache = {} # date to group name, the same dates are seen for many participants
+
+    def getArrays(self, group):
+        if group not in self.counts:
+            self.counts[group] = np.zeros((len(self.percentiles), self.bins), dtype=np.int64)
+            self.missing[group] = np.zeros(len(self.percentiles), dtype=np.int64)
+        return self.counts[group], self.missing[group]
+
+    def add(self, date, results):
+        """
+        Adds the results of a day
+        :param date: the date of the day as YYYY-MM-DD
+        :param results: list of the results of every percentile, as chronPercentile calculates them
+        :return: none
+        """
+        group = self.groupCache.get(date)
+        if group == None:
+            group = self.groupCache[date] = getGroup(date, self.groupBy)
+        counts, missing = self.getArrays(group)
+        fractions = np.array([toFraction(value) for value in results], dtype=np.float64)
+        found = ~np.isnan(fractions)
+        missing += ~found
+        bins = np.clip((fractions[found] * self.bins).astype(np.int64), 0, self.bins - 1)
+        counts[np.flatnonzero(found), bins] += 1
+
+    def isCompatible(self, other):
+        """
+        :param other: another CohortSummary
+        :return: whether both summaries have the same settings and can be merged
+        """
+        return (self.percentiles == other.percentiles) and (self.unit == other.unit) and \
+               (self.groupBy == other.groupBy) and (self.bins == other.bins)
+
+    def merge(self, other):
+        """
+        Adds the histograms of another summary to this one
+        :param other: CohortSummary with the same settings
+        :return: none
+        """
+        if not self.isCompatible(other):
+            raise ValueError("Summaries with different percentiles, units, groups or bins can not be merged")
+        for group in other.counts:
+            counts, missing = self.getArrays(group)
+            counts += other.counts[group]
+            missing += other.missing[group]
+
+    def getQuantiles(self, group, quantiles):
+        """
+        Estimates quantiles of the results of a group, interpolating linearly inside a bin.
+        :param group: name of the group
+        :param quantiles: list of the quantiles between 0 and 1
+        :return: (percentiles x quantiles) array of the quantiles as fractions of the day or wake period, NaN for
+        percentiles without results
+        """
+        counts = self.counts[group]
+        estimates = np.full((len(self.percentiles), len(quantiles)), np.nan)
+        for j in range(len(self.percentiles)):
+            cumulative = np.cumsum(counts[j])
+            if cumulative[-1] == 0:
+                continue
+            for k in range(len(quantiles)):
+                rank = quantiles[k] * cumulative[-1]
+                # the first bin reaching the rank, for the quantile 0 the first one holding a result
+                bin = min(int(np.searchsorted(cumulative, rank, side="left" if rank > 0 else "right")), self.bins - 1)
+                before = cumulative[bin - 1] if bin > 0 else 0
+                inside = (rank - before) / counts[j, bin] if counts[j, bin] > 0 else 0
+                estimates[j, k] = (bin + inside) / self.bins
+        return estimates
+
+    def save(self, fileName):
+        """
+        Writes the summary to a .npz file, under a temporary name first, so a cut off run leaves no broken summary.
+        :param fileName: path of the file
+        :return: none
+        """
+        groups = sorted(self.counts)
+        counts = np.array([self.counts[group] for group in groups], dtype=np.int64).reshape(
+            len(groups), len(self.percentiles), self.bins)
+        missing = np.array([self.missing[group] for group in groups], dtype=np.int64).reshape(
+            len(groups), len(self.percentiles))
+        with open(fileName + ".part", "wb") as file:
+            np.savez_compressed(file, version=SUMMARY_VERSION, percentiles=np.array(self.percentiles),
+                                unit=self.unit, groupBy=np.array(self.groupBy, dtype=str), bins=self.bins,
+                                groups=np.array(groups, dtype=str), counts=counts, missing=missing)
+        os.replace(fileName + ".part", fileName)
+
+
+def loadSummary(fileName):
+    """
+    :param fileName: path of a file written by CohortSummary.save
+    :return: the CohortSummary
+    """
+    with np.load(fileName, allow_pickle=False) as arrays:
+        if int(arrays["version"]) != SUMMARY_VERSION:
+            raise ValueError("The summary {} was written by another version of cohortSummary".format(fileName))
+        summary = CohortSummary(arrays["percentiles"].tolist(), str(arrays["unit"]), arrays["groupBy"].tolist(),
+                                int(arrays["bins"]))
+        for k, group in enumerate(arrays["groups"].tolist()):
+            summary.counts[group] = arrays["counts"][k].copy()
+            summary.missing[group] = arrays["missing"][k].copy()
+    return summary
+
+
+def formatValue(fraction, unit):
+    """
+    :param fraction: a fraction of the day or wake period, NaN if there is none
+    :param unit: UNIT_TIME to format it as HH:MM:SS, UNIT_FRACTION to keep it
+    :return: the formatted value
+    """
+    if np.isnan(fraction):
+        return "NA"
+    if unit == UNIT_TIME:
+        seconds = min(int(round(fraction * DAYSECONDS)), DAYSECONDS - 1)
+        return "{:02d}:{:02d}:{:02d}".format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+    return "{:.5f}".format(fraction)
+
+
+def formatSummary(summary, quantiles=DEFAULT_QUANTILES):
+    """
+    Formats the quantiles of every group and percentile as a tab separated table
+    :param summary: the CohortSummary
+    :param quantiles: list of the quantiles to report
+    :return: the table as one string
+    """
+    text = "Group\tPercentile\tDays\tMissing" + "".join("\tq{}".format(quantile) for quantile in quantiles) + "\n"
+    for group in sorted(summary.counts):
+        estimates = summary.getQuantiles(group, quantiles)
+        for j in range(len(summary.percentiles)):
+            text += "{}\t{}\t{}\t{}".format(group, summary.percentiles[j], int(summary.counts[group][j].sum()),
+                                            int(summary.missing[group][j]))
+            text += "".join("\t" + formatValue(estimate, summary.unit) for estimate in estimates[j]) + "\n"
+    return text
+
+
+def main():
+    """
+    Merges summary files of chronPercentile --summary runs and reports the quantiles of the merged distributions
+    :return: none
+    """
+    parser = argparse.ArgumentParser(description="Script to merge the cohort summaries of chronPercentile runs and "
+                                                 "report their quantiles")
+    parser.add_argument("summaries", nargs="+", help="summary files written with chronPercentile --summary")
+    parser.add_argument("-o", type=str, dest="out", help="file to write the merged summary to")
+    parser.add_argument("-q", nargs="+", type=float, dest="quantiles", default=DEFAULT_QUANTILES,
+                        help="quantiles to report, default {}".format(" ".join(str(q) for q in DEFAULT_QUANTILES)))
+    parser.add_argument("-t", type=str, dest="table", help="file to write the quantile table to, it is printed "
+                                                           "otherwise")
+    args = parser.parse_args()
+    summary = None
+    for fileName in args.summaries:
+        try:
+            part = loadSummary(fileName)
+        except (OSError, ValueError, KeyError):
+            print("ERROR: The summary " + fileName + " could not be read.")
+            return
+        if summary == None:
+            summary = part
+        elif not summary.isCompatible(part):
+            print("ERROR: The summary " + fileName + " has other percentiles, units, groups or bins than "
+                  + args.summaries[0] + " and can not be merged.")
+            return
+        else:
+            summary.merge(part)
+    if args.out != None:
+        summary.save(args.out)
+    table = formatSummary(summary, args.quantiles)
+    if args.table != None:
+        with open(args.table, "w") as tableFile:
+            tableFile.write(table)
+    else:
+        print(table, end="")
+
+
+if __name__ == "__main__":
+    main()
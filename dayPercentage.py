@@ -1,78 +1,175 @@
 import argparse
+import contextlib
+import io
+import multiprocessing
 import os
-#import epochConv
+import sys
+import traceback
 import datetime
+import fileReader
 
 ALLOWED_EXTENSIONS = (".tsv")
 HEADER_COLUMNS = 2
 DAYSECONDS = (24* 3600)
 PRECISION = 8
-BUFFERLENGTH = 10000
+DEFAULT_PRECISION = 5 # number of decimal places used, if -p is not given
+WRITE_BUFFER_SIZE = 1024 * 1024 # size of the output file buffer in bytes
+TIME_LENGTH = 8 # length of a time in the HH:MM:SS format
+PERCENTAGE_SUFFIX = "_dayPercentage.tsv" # replaces .tsv in the output file names of a batch run
+SECONDS_SUFFIX = "_daySeconds.tsv"
+COLON = ord(":")
+ZERO = ord("0")
 
 
-def convertLine(line, precision = PRECISION):
+def getConversionTable(precision=PRECISION, seconds=False):
+    """
+    Creates the output of every possible time, so that converting a time only needs a lookup.
+    :param precision: number of decimal place to round to, when converting to a percentage of the day
+    :param seconds: whether times are converted to seconds since midnight instead of a percentage of the day
+    :return: numpy array of the output strings, indexed by the seconds since midnight
+    """
+    import numpy as np # only needed once times are converted, so importing dayPercentage stays light
+    if seconds:
+        return np.array([str(second) for second in range(DAYSECONDS)], dtype=object)
+    return np.array(["{}".format(round(second / DAYSECONDS, precision)) for second in range(DAYSECONDS)], dtype=object)
+
+
+def parseTime(time):
+    """
+    Converts a single time the way datetime.strptime would read it.
+    :param time: time in the format HH:MM:SS
+    :return: the seconds since midnight, -1 if it is not a valid time
+    """
+    try:
+        fractionTime = datetime.datetime.strptime(time, "%H:%M:%S").time()
+    except ValueError:
+        return -1
+    return fractionTime.hour*3600+ fractionTime.minute*60 + fractionTime.second
+
+
+def parseTimes(times):
+    """
+    Converts a list of times into seconds since midnight. Times in the exact HH:MM:SS format are converted at once, by
+    reading the digits at their fixed positions, any other is handed to parseTime.
+    :param times: list of times as strings
+    :return: int64 numpy array of the seconds since midnight, -1 where a time is not valid
+    """
+    import numpy as np # see getConversionTable
+    seconds = np.full(len(times), -1, dtype=np.int64)
+    lengths = np.fromiter(map(len, times), dtype=np.int64, count=len(times))
+    fixed = np.flatnonzero(lengths == TIME_LENGTH)
+    slow = [np.flatnonzero(lengths != TIME_LENGTH)]
+    text = "".join(times if len(fixed) == len(times) else [times[n] for n in fixed.tolist()]).encode("utf-8")
+    if len(text) == TIME_LENGTH * len(fixed):
+        characters = np.frombuffer(text, dtype=np.uint8).reshape(len(fixed), TIME_LENGTH).astype(np.int64)
+        digits = characters[:, [0, 1, 3, 4, 6, 7]] - ZERO
+        hours = digits[:, 0] * 10 + digits[:, 1]
+        minutes = digits[:, 2] * 10 + digits[:, 3]
+        secs = digits[:, 4] * 10 + digits[:, 5]
+        valid = (characters[:, 2] == COLON) & (characters[:, 5] == COLON) & np.all((digits >= 0) & (digits <= 9), axis=1) \
+            & (hours < 24) & (minutes < 60) & (secs < 60)
+        seconds[fixed[valid]] = (hours * 3600 + minutes * 60 + secs)[valid]
+        slow.append(fixed[~valid])
+    else:
+        slow.append(fixed) # there are non ascii characters, so the positions are not fixed
+    for n in np.concatenate(slow).tolist():
+        # any format strptime may accept as well, e.g. single digit numbers
+        seconds[n] = parseTime(times[n])
+    return seconds
+
+
+def convertLines(lines, table):
+    """
+    Converts a block of lines of the input, replacing the times outside the header columns with the entries of a
+    conversion table. Lines containing anything but times outside the header columns are dropped.
+    :param lines: list of text lines with the amount of header columns specified in HEADER_COLUMNS and times in the
+    format HH:MM:SS, seperated by tab
+    :param table: conversion table as returned by getConversionTable
+    :return: list of the converted lines
+    """
+    import numpy as np # see getConversionTable
+    rows = [line.strip().split("\t") for line in lines]
+    times = [fraction for lineParts in rows for fraction in lineParts[HEADER_COLUMNS:]]
+    seconds = parseTimes(times)
+    ends = np.cumsum([max(len(lineParts) - HEADER_COLUMNS, 0) for lineParts in rows], dtype=np.int64)
+    starts = ends - [max(len(lineParts) - HEADER_COLUMNS, 0) for lineParts in rows]
+    # lines with an invalid time are dropped as a whole
+    invalid = np.zeros(len(times) + 1, dtype=np.int64)
+    invalid[1:] = np.cumsum(seconds < 0)
+    keep = (invalid[ends] == invalid[starts]).tolist()
+    converted = table[np.maximum(seconds, 0)].tolist()
+    outLines = ["\t".join(lineParts[:HEADER_COLUMNS] + converted[start:end]) + "\n"
+                for lineParts, start, end, kept in zip(rows, starts.tolist(), ends.tolist(), keep) if kept]
+    return outLines
+
+
+def convertLine(line, precision = PRECISION, seconds=False):
     """
     Takes a single line of the input and converts given time values outside the header column into a percentage of the day.
     :param line: text line with the amount of heade columns specified in HEADER_COLUMNS and time in the format HH:MM:SS, seperated by tab
     :param precision: number of decimal place to round to, when converting
-    :return: line, as before but with the times replaced with the corresponding percentage of the day
-    """
-    lineParts = line.strip().split("\t")
-    outLine = ""
-    fractionCounter = 0
-    for fraction in lineParts:
-        # two columns are always to be copied
-        if fractionCounter < HEADER_COLUMNS:
-            if outLine == "":
-                outLine += fraction
-            else:
-                outLine += "\t" + fraction
-        else: # normal time
-
-            try:
-                fractioDT = datetime.datetime.strptime(fraction, "%H:%M:%S")
-                fractionTime = fractioDT.time()
-                seconds = fractionTime.hour*3600+ fractionTime.minute*60 + fractionTime.second
-                percent = seconds /DAYSECONDS                                                   # to get seconds change here to : seconds + "/" + DAYSECONDS
-            except ValueError:
-                return ""
-            outLine += "\t{}".format(round(percent,precision))                                  # to get seconds change here to : outLine += "\t" + percent
+    :param seconds: whether times are converted to seconds since midnight instead of a percentage of the day
+    :return: line, as before but with the times replaced with the corresponding percentage of the day, or an empty
+    string if the line contains anything but times
+    """
+    outLines = convertLines([line], getConversionTable(precision, seconds))
+    return outLines[0] if outLines else ""
 
-        fractionCounter += 1
-    outLine += "\n"
-    return outLine
 
-def convertPercentages(infile, outfile = "", precision = PRECISION):
+def convertPercentages(infile, outfile = "", precision = PRECISION, seconds=False):
     """
-    Function that converts a whole chronPercentile file from time into
+    Function that converts a whole chronPercentile file from time into percentages of the day. The file is read and
+    converted block wise and the results are appended to the output through a single buffered handle.
     :param infile: file path to a file created with chron percentile
-    :param outfile: path the changed file should be saved to
+    :param outfile: path the changed file should be saved to, an empty string to print it
     :param precision: precision of the float conversion of the percentage calculation
+    :param seconds: whether times are converted to seconds since midnight instead of a percentage of the day
     """
-    with open(infile, "r") as inFile:
-        lineCount = 0
-        outLine = ""
-        start = True
-        for line in inFile:
-            lineCount += 1
+    table = getConversionTable(precision, seconds)
+    outFile = open(outfile, "a", buffering=WRITE_BUFFER_SIZE) if outfile != "" else sys.stdout
+    try:
+        with fileReader.openLines(infile) as inFile:
             # one header line, that should be written straight away
-            if not start:
-                # normal line
-                outLine += convertLine(line, precision)
-            else:
-                outLine = line
-                start = False
-            if outfile != "":
-                if lineCount > BUFFERLENGTH:
-                    with open(outfile, "a") as outFile :
-                        outFile.write(outLine)
-                    lineCount = 0
-                    outLine = ""
-            else:
-                print(outLine)
-    if outfile != "": # final leftover save
-        with open(outfile, "a") as outFile:
-            outFile.write(outLine)
+            outFile.write(inFile.readline())
+            block = inFile.readBlock()
+            while block:
+                outFile.writelines(convertLines(block, table))
+                block = inFile.readBlock()
+    finally:
+        if outfile != "":
+            outFile.close()
+        else:
+            outFile.flush()
+
+def getOutFileName(fileName, outdir="", seconds=False):
+    """
+    :param fileName: path of an input file of a batch run
+    :param outdir: the output directory, an empty string to write the output next to the input file
+    :param seconds: whether times are converted to seconds since midnight instead of a percentage of the day
+    :return: the path of the output file, [old_name]_dayPercentage.tsv or [old_name]_daySeconds.tsv
+    """
+    outName = os.path.splitext(os.path.basename(fileName))[0] + (SECONDS_SUFFIX if seconds else PERCENTAGE_SUFFIX)
+    return os.path.join(outdir if outdir != "" else os.path.dirname(fileName), outName)
+
+def convertFile(task):
+    """
+    Converts a single file of a batch run into its own output file, used by main both serially and in the worker
+    processes.
+    :param task: tuple of (input file, output file, precision, seconds), see convertPercentages
+    :return: tuple of (input file, output file, error message), the error message is None if the conversion succeeded
+    """
+    fileName, outFileName, precision, seconds = task
+    try:
+        try:
+            os.remove(outFileName) # convertPercentages appends
+        except OSError:
+            pass
+        convertPercentages(fileName, outFileName, precision, seconds)
+    except Exception:
+        error = io.StringIO()
+        traceback.print_exc(file=error)
+        return fileName, outFileName, error.getvalue()
+    return fileName, outFileName, None
 
 def main():
     """
@@ -81,26 +178,46 @@ def main():
     """
     # takes accelerometer file (both formats) or directory,
     parser = argparse.ArgumentParser(description="Script to change times to day percentages")
-    parser.add_argument("inlis", metavar="IL",  help="Location of a file or a directory to be read")
-    parser.add_argument("-o", nargs="?", type=str, dest="out", const="", help="output location")
-    parser.add_argument("-p", nargs="?", type=int, dest="precision", const="5", help="number of decimal places for the output")
+    parser.add_argument("inlis", metavar="IL",  help="Location of a file, a directory or a plain text list of files "
+                                                     "to be read")
+    parser.add_argument("-o", nargs="?", type=str, dest="out", const="", default="", help="output location, the "
+                        "output directory for a directory or list of files, whose outputs are otherwise written next "
+                        "to their input files")
+    parser.add_argument("-p", nargs="?", type=int, dest="precision", const=DEFAULT_PRECISION,
+                        default=DEFAULT_PRECISION, help="number of decimal places for the output")
+    parser.add_argument("-s", action="store_true", dest="seconds", help="convert the times to seconds since midnight "
+                                                                        "instead of percentages of the day")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes converting the files of a "
+                                                            "directory or list in parallel. 0 uses all available "
+                                                            "cores.")
     args = parser.parse_args()
-    fileList = []
-    # check percentage level input
-    percentages = []
     if os.path.isfile(os.path.abspath(args.inlis)) and args.inlis.endswith(ALLOWED_EXTENSIONS):
         # only one file to look at
-        fileList.append(os.path.abspath(args.inlis))
-    else: # a directory or file list
-       #  fileList = epochConv.getFiles(args.inlis)
-        print("cant do on cook due to pytz missing, reenable once available")
-    try:
-        os.remove(os.path.abspath(args.out))
-    except:
-        pass
-    #calculate results
-    for fileName in fileList:
-        resultString= convertPercentages(fileName, args.out, args.precision)
+        try:
+            os.remove(os.path.abspath(args.out))
+        except:
+            pass
+        convertPercentages(os.path.abspath(args.inlis), args.out, args.precision, args.seconds)
+        return
+    # a directory or file list, every file gets its own output file
+    fileList = [fileName for fileName in fileReader.listFiles(args.inlis, ALLOWED_EXTENSIONS)
+                if not fileName.endswith((PERCENTAGE_SUFFIX, SECONDS_SUFFIX))] # outputs of earlier runs
+    if args.out != "":
+        os.makedirs(args.out, exist_ok=True)
+    tasks = [(fileName, getOutFileName(fileName, args.out, args.seconds), args.precision, args.seconds)
+             for fileName in fileList]
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    failed = 0
+    with multiprocessing.Pool(min(jobs, max(len(tasks), 1))) if jobs > 1 else contextlib.nullcontext() as pool:
+        results = pool.imap(convertFile, tasks) if pool != None else map(convertFile, tasks)
+        for fileName, outFileName, error in results:
+            if error == None:
+                print("STATUS: Converted " + fileName + " to " + outFileName)
+            else:
+                failed += 1
+                print("ERROR: The file: " + fileName + " could not be converted.")
+                print(error, end="")
+    print("STATUS: Batch finished: {} converted, {} failed.".format(len(tasks) - failed, failed))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,19 +1,53 @@
 import argparse
-import gzip
+import contextlib
+import io
+import multiprocessing
 import datetime
+import hashlib
+import json
+import math
 import os
-import pytz
+import shutil
 import traceback
 import string
+import sys
+import fileReader
+import profiler
+try:
+    import numpy as np
+except ImportError:
+    # numpy is only needed for the vectorized engine, the loop engine works without it
+    np = None
 
 EPOCH_TIME = 5 # assumed EPOCH time in previous
-WRITE_BUFFER = 100 # the number of conversions done before the results are logged into the outputfile
+WRITE_BUFFER = 100 # the number of conversions done before the results are handed to the output file
+WRITE_BUFFER_SIZE = 1024 * 1024 # size of the output file buffer in bytes
 ALLOWED_PLAIN_EXTENSIONS = [".csv", ".txt"] # non compressed file types this script assumes to be able to operate with.
 PREFIX_SET = False
 TIMEZONE = "Europe/London"
+ENGINES = ("loop", "numpy") # available conversion engines, loop is the line by line reference implementation
+DEFAULT_ENGINE = "numpy" if np is not None else "loop"
+CHUNK_EPOCHS = 10000 # the number of output epochs the numpy engine converts at once
+STATUS_CONVERTED = "converted" # possible results of workFile
+STATUS_SKIPPED = "skipped"
+STATUS_FAILED = "failed"
+SIDECAR_EXTENSION = ".npy" # extension of the binary copy of an output file, replacing .tsv
+# layout of the binary copy, one record per epoch holding the values as they are written to the text file
+SIDECAR_DTYPE = [("time", "<M8[s]"), ("value", "<f4"), ("imputed", "<f4")]
+MANIFEST_NAME = "epochConv_manifest.jsonl" # run manifest in the output directory, see Manifest
 # TODO add output file extension parameter to allow for other file extensions than .tsv
 
 
+def getTimeZone():
+    """
+    pytz is only imported here, so that scripts importing epochConv do not load the timezone database unless they
+    create timestamps.
+    :return: the pytz timezone of TIMEZONE
+    """
+    import pytz
+    return pytz.timezone(TIMEZONE)
+
+
 def getTimeStampDT(headerLine, offsetLine,epochTime=EPOCH_TIME, dayLightSavingsTime=False):
     timeStamp = ""
     headerInfo = str(headerLine).split(" ")
@@ -28,7 +62,7 @@ def getTimeStampDT(headerLine, offsetLine,epochTime=EPOCH_TIME, dayLightSavingsT
     offsetSec = offsetLine * EPOCH_TIME
     offset = datetime.timedelta(seconds=offsetSec)
     startInfo = startDate + " " + startTime
-    gmt = pytz.timezone(TIMEZONE)
+    gmt = getTimeZone()
     startDateTime = datetime.datetime.strptime(startInfo, '%Y-%m-%d %H:%M:%S').astimezone(gmt)
     currentTime = startDateTime + offset
     if dayLightSavingsTime:
@@ -56,11 +90,118 @@ def getTimeStamp(headerLine, offsetLine, dayLightSavingsTime=False):
     :return Timestamp in the format YYYY-MM-DDThh:mm:ss
     """
 
-    timeStamp = getTimeStampDT(headerLine,offsetLine,dayLightSavingsTime).strftime("%Y-%m-%dT%H:%M:%S")
+    timeStamp = getTimeStampDT(headerLine, offsetLine,
+                               dayLightSavingsTime=dayLightSavingsTime).strftime("%Y-%m-%dT%H:%M:%S")
 
     return timeStamp
 
 
+def getStartDateTime(headerLine):
+    """
+    Parses the start of the measurement from a header line in the format described in getTimeStamp, exactly as
+    getTimeStampDT does, so that this only needs to be done once per file.
+    :param headerLine: The line containing the date information, usually the first line of the file.
+    :return: timezone aware datetime of the first sample in TIMEZONE
+    """
+    headerInfo = str(headerLine).split(" ")
+    if int(headerInfo[11]) != EPOCH_TIME:
+        raise AttributeError
+    startInfo = headerInfo[3] + " " + headerInfo[4]
+    return datetime.datetime.strptime(startInfo, '%Y-%m-%d %H:%M:%S').astimezone(getTimeZone())
+
+
+def getDSTSwitches(startDateTime):
+    """
+    Precomputes at which line offsets the daylight savings time adjustment of getTimeStampDT changes for a measurement
+    starting at startDateTime.
+    :param startDateTime: timezone aware start of the measurement, as returned by getStartDateTime
+    :return: tuple of two lists, the first line offsets at which a new adjustment applies and the adjustment
+    (timedelta) from that offset onwards. None if the transitions of the timezone can not be read, the timestamps
+    then need to be created with getTimeStampDT line by line.
+    """
+    gmt = getTimeZone()
+    # the transitions are internals of pytz, timezones without transitions or other pytz versions may lack them
+    transitionTimes = getattr(gmt, "_utc_transition_times", None)
+    transitionInfos = getattr(gmt, "_transition_info", None)
+    if (transitionTimes is None) or (transitionInfos is None):
+        return None
+    nullTime = datetime.timedelta(0)
+    oneHour = datetime.timedelta(hours=1)
+    startDST = startDateTime.dst()
+    startUTC = startDateTime.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    offsets = []
+    shifts = []
+    for transitionTime, transitionInfo in zip(transitionTimes, transitionInfos):
+        if transitionTime <= startUTC:
+            continue
+        dst = transitionInfo[1]
+        shift = nullTime
+        if (startDST == nullTime) & (dst == oneHour):
+            shift = oneHour
+        elif (startDST == oneHour) & (dst == nullTime):
+            shift = -oneHour
+        offsets.append(math.ceil((transitionTime - startUTC).total_seconds() / EPOCH_TIME))
+        shifts.append(shift)
+    return offsets, shifts
+
+
+def timeStampGenerator(headerLine, startOffset=1, step=1, dayLightSavingsTime=False):
+    """
+    Generates the same timestamps as getTimeStampDT for the line offsets startOffset, startOffset + step, ... but
+    parses the header only once and then adds up the epoch stride. Daylight savings time changes are looked up from
+    the switches precomputed by getDSTSwitches.
+    :param headerLine: The line containing the date information, usually the first line of the file.
+    :param startOffset: line offset of the first timestamp
+    :param step: number of lines between two timestamps
+    :param dayLightSavingsTime: Whether or not daylight savings time changes should be applied to the timestamps.
+    :return: generator of timezone aware datetime objects
+    """
+    startDateTime = getStartDateTime(headerLine)
+    switches = getDSTSwitches(startDateTime) if dayLightSavingsTime else ([], [])
+    if switches is None:
+        offset = startOffset
+        while True:
+            yield getTimeStampDT(headerLine, offset, dayLightSavingsTime=True)
+            offset += step
+    switchOffsets, switchShifts = switches
+    stride = datetime.timedelta(seconds=step * EPOCH_TIME)
+    currentTime = startDateTime + datetime.timedelta(seconds=startOffset * EPOCH_TIME)
+    offset = startOffset
+    shift = datetime.timedelta(0)
+    switch = 0
+    while True:
+        while (switch < len(switchOffsets)) and (offset >= switchOffsets[switch]):
+            shift = switchShifts[switch]
+            switch += 1
+        yield currentTime + shift
+        currentTime += stride
+        offset += step
+
+
+def getTimeStampArray(headerLine, offsets, dayLightSavingsTime=False):
+    """
+    Vectorized version of getTimeStamp for many line offsets at once.
+    :param headerLine: The line containing the date information, usually the first line of the file.
+    :param offsets: numpy integer array of line offsets
+    :param dayLightSavingsTime: Whether or not daylight savings time changes should be applied to the timestamps.
+    :return: numpy datetime64[s] array of the local timestamps, without timezone
+    """
+    startDateTime = getStartDateTime(headerLine)
+    start = np.datetime64(startDateTime.replace(tzinfo=None), "s")
+    timeStamps = start + (offsets * EPOCH_TIME).astype("timedelta64[s]")
+    if dayLightSavingsTime:
+        switches = getDSTSwitches(startDateTime)
+        if switches is None:
+            return np.array([np.datetime64(getTimeStampDT(headerLine, offset, dayLightSavingsTime=True).replace(
+                tzinfo=None), "s") for offset in offsets.tolist()], dtype="datetime64[s]")
+        switchOffsets, switchShifts = switches
+        if switchOffsets:
+            shifts = np.array([0] + [int(shift.total_seconds()) for shift in switchShifts], dtype=np.int64)
+            timeStamps = timeStamps + shifts[np.searchsorted(switchOffsets, offsets, side="right")].astype(
+                "timedelta64[s]")
+    return timeStamps
+
+
 def header(headerLine, epoch):
     """
     header(headerLine, epoch) creates a new header for the output from the existing header  in the following format:
@@ -115,9 +256,44 @@ def getOutFileName(filename, outdir, epoch, prefix="", keepName=False):
     return outfile
 
 
+def getOutFileNames(filename, outdir, epoch, prefix="", keepName=False):
+    """
+    Output paths of a conversion into one or several epochs. With several epochs and a prefix, _avg_[epoch] is appended
+    to the names getOutFileName creates, so that the files of the different epochs do not overwrite each other.
+    :param filename: input file name
+    :param outdir: output directory for the files
+    :param epoch: the epoch to convert to or a list of epochs
+    :param prefix: the new prefix, see getOutFileName
+    :param keepName: whether the new file names should contain the old file name
+    :return: list of the absolute paths, one per epoch
+    """
+    epochs = getEpochs(epoch)
+    outfiles = [getOutFileName(filename, outdir, epoch, prefix, keepName) for epoch in epochs]
+    if (len(epochs) > 1) & (prefix != ""):
+        outfiles = [os.path.splitext(outfile)[0] + "_avg_{}.tsv".format(epoch) for outfile, epoch in zip(outfiles, epochs)]
+    return outfiles
+
+
+def getEpochs(epoch):
+    """
+    :param epoch: an epoch in seconds or a list of epochs
+    :return: list of the epochs
+    """
+    return list(epoch) if isinstance(epoch, (list, tuple)) else [epoch]
+
+
 # TODO acknowledge that for some epochs the last average may not be a true representation, should be done in the
 # documentation, as the code handles "missing" data correctly
-def workFile(filename, epoch, outdir, prefix="", keepName=False, daylightSavingsTime=False, noConsoleOutput=False, noOverwrite=False):
+def getSidecarName(outputFile):
+    """
+    :param outputFile: path of an output file of workFile
+    :return: path of the binary copy of the output file, see SidecarFile
+    """
+    return os.path.splitext(outputFile)[0] + SIDECAR_EXTENSION
+
+
+def workFile(filename, epoch, outdir, prefix="", keepName=False, daylightSavingsTime=False, noConsoleOutput=False, noOverwrite=False,
+             engine=DEFAULT_ENGINE, bufferSize=WRITE_BUFFER_SIZE, sidecar=False):
     """
     workFile is the central function to convert a file with one epoch to another epoch, not overwriting the original data
     it offers a few options in regards to how the new file should behave. It can be specified, whether a daylight
@@ -126,7 +302,8 @@ def workFile(filename, epoch, outdir, prefix="", keepName=False, daylightSavings
     either with or without the old file name attached can be specified and most importantly output directory and new
     epoch can be specified
     :param filename: the absolute path to the file that should be converted
-    :param epoch: the new epoch in seconds to convert to (needs to be a multiple of 5 or 5)
+    :param epoch: the new epoch in seconds to convert to (needs to be a multiple of 5 or 5), or a list of epochs. Several
+    epochs are converted in a single pass over the file, each into its own output file, see getOutFileNames
     :param outdir: relative or absolute path to the output directory
     :param prefix: a new prefix, which will replace the old filename, when keepName is False, otherwise it will be put
     in front of the old file name
@@ -134,72 +311,134 @@ def workFile(filename, epoch, outdir, prefix="", keepName=False, daylightSavings
     :param daylightSavingsTime: specifies, whether or not there should be an auto adjust for the daylight savings time,
      if a change from dst to standard time (or inverse) occurs in the raw file
     :param noConsoleOutput: whether or not the function should output errors or  status messages to the console
-    :return: none
+    :param engine: the conversion engine to use, either "loop" (line by line reference) or "numpy" (vectorized). Both
+    produce identical output files.
+    :param bufferSize: size of the output buffer in bytes
+    :param sidecar: whether a binary copy of the output should be written next to it, see SidecarFile. This needs the
+    numpy engine.
+    :return: STATUS_CONVERTED, STATUS_SKIPPED or STATUS_FAILED
     """
-    # how many lines need to be read to convert one 5 second epoch to the new epoch time EPOCH
-    linesNeeded = epoch/EPOCH_TIME
-    lineAccumulator = []
-    resultLineAcc = []
-    lineCount = 0
-    headerlinefound = False
-    headerLine = ""
+    if (engine not in ENGINES) | ((engine == "numpy") & (np is None)):
+        if not noConsoleOutput:
+            print("ERROR: Conversion engine " + str(engine) + " is not available, file skipped.")
+        return STATUS_FAILED
+    if sidecar & (engine != "numpy"):
+        if not noConsoleOutput:
+            print("ERROR: Binary output files can only be created by the numpy engine, file skipped.")
+        return STATUS_FAILED
     outdir = os.path.realpath(outdir)
     extension= os.path.splitext(filename)[1]
-    outputFile = getOutFileName(filename, outdir, epoch, prefix, keepName)
-    # if this file exists already, delete it.
-    try:
+    epochs = []
+    outputFiles = []
+    for epoch, outputFile in zip(getEpochs(epoch), getOutFileNames(filename, outdir, epoch, prefix, keepName)):
+        # an existing file is only replaced once the new one is complete, see OutputFile.commit
         if noOverwrite & (os.path.isfile(outputFile)):
             print("STATUS: File " + outputFile + " does exist already, it will be skipped.")
-            return
-        os.remove(outputFile)
-    except OSError:
-        pass
-    # find out whether to gzip open or to plain open it
-    compressed = False
-    if (extension == ".gz") & (os.path.basename(filename).endswith(".csv.gz")):
-        file = gzip.open(filename, "r")
-        compressed = True
-    elif (extension in ALLOWED_PLAIN_EXTENSIONS):
-        file = open(filename, "r")
+            continue
+        epochs.append(epoch)
+        outputFiles.append(outputFile)
+    if not epochs:
+        return STATUS_SKIPPED
+    # only open known file types, compressed files are decompressed by the reader
+    if ((extension == ".gz") & (os.path.basename(filename).endswith(".csv.gz"))) | (extension in ALLOWED_PLAIN_EXTENSIONS):
+        file = fileReader.openLines(filename)
     else:
         if not noConsoleOutput:
             print("ERROR: Unknown file format: " + extension + ", file skipped.")
-        return
+        return STATUS_FAILED
+    converted = False
+    outputs = []
+    binaryOutputs = [] if sidecar else None
     try:
-        for line in file:
-            if compressed:
-                line = line.decode("utf-8")
-            if headerlinefound == False:
-                headerlinefound= True
-                headerLine = line
-                # new header output:
-                resultLineAcc.append(header(headerLine, epoch))
-                continue
-            lineAccumulator.append(line)
-            lineCount = lineCount + 1
-            if (len(lineAccumulator) >= linesNeeded):
-                try:
-                    resultLineAcc.append(epochConversion(lineAccumulator, getTimeStamp(headerLine,(lineCount - (len(lineAccumulator)-1)), daylightSavingsTime)))
-                    lineAccumulator.clear()
-                except IndexError:
-                    if not noConsoleOutput:
-                        print("ERROR: Line around line number" + lineCount + " seems corrupted and missing a value. "
-                                                                         "File conversion was aborted.")
-                    return
-                except AttributeError:
-                    if not noConsoleOutput:
-                        print("ERROR: time stamp creation failed, check sample rate defined equals the program defined sampling "
-                          "rate ")
-                    return
-            if len(resultLineAcc) >= WRITE_BUFFER:
-                writePart(outputFile, resultLineAcc, noConsoleOutput)
-                resultLineAcc.clear()
-        # write the remaining details into the output file
-        if resultLineAcc:
-            writePart(outputFile, resultLineAcc, noConsoleOutput)
+        # inside the try, so the input file is closed and the outputs opened so far are discarded as well, if an
+        # output file can not be opened
+        for outputFile in outputFiles:
+            outputs.append(OutputFile(outputFile, bufferSize))
+            if sidecar:
+                binaryOutputs.append(SidecarFile(getSidecarName(outputFile)))
+        if engine == "numpy":
+            converted = workFileEpochs(file, epochs, outputs, daylightSavingsTime, noConsoleOutput, binaryOutputs)
+        else:
+            # the reference implementation reads the file once per epoch
+            converted = True
+            for epoch, output in zip(epochs, outputs):
+                file.seek(0)
+                converted = converted and workFileLoop(file, epoch, output, daylightSavingsTime, noConsoleOutput)
     finally:
         file.close()
+        # only a complete conversion is moved to the output file names
+        for k in range(len(outputs)):
+            if converted:
+                with profiler.stage("write"):
+                    outputs[k].commit()
+                # the binary copy is committed last, so it is never older than the output file it belongs to
+                if binaryOutputs != None:
+                    with profiler.stage("binary"):
+                        binaryOutputs[k].commit()
+                else:
+                    # a binary copy of a previous run would no longer match the new output file
+                    removeFile(getSidecarName(outputs[k].path))
+            else:
+                outputs[k].discard()
+                if (binaryOutputs != None) and (k < len(binaryOutputs)):
+                    binaryOutputs[k].discard()
+    return STATUS_CONVERTED if converted else STATUS_FAILED
+
 
+def workFileLoop(file, epoch, output, daylightSavingsTime=False, noConsoleOutput=False):
+    """
+    Line by line conversion of an opened file, the reference implementation for workFileVectorized. Lines are
+    collected until an epoch is full and then averaged with epochConversion.
+    :param file: the input file opened with fileReader.openLines, positioned at its start
+    :param epoch: the new epoch in seconds to convert to
+    :param output: the OutputFile the results are written to
+    :param daylightSavingsTime: whether the timestamps should be adjusted for daylight savings time
+    :param noConsoleOutput: whether or not the function should output errors to the console
+    :return: True if the file was converted, False if the conversion was aborted
+    """
+    # how many lines need to be read to convert one 5 second epoch to the new epoch time EPOCH
+    linesNeeded = epoch/EPOCH_TIME
+    lineAccumulator = []
+    resultLineAcc = []
+    lineCount = 0
+    headerlinefound = False
+    headerLine = ""
+    for line in file:
+        if headerlinefound == False:
+            headerlinefound= True
+            headerLine = line
+            # new header output:
+            resultLineAcc.append(header(headerLine, epoch))
+            # one timestamp per epoch, the first one belongs to the first line after the header
+            timeStamps = timeStampGenerator(headerLine, 1, int(linesNeeded), daylightSavingsTime)
+            continue
+        lineAccumulator.append(line)
+        lineCount = lineCount + 1
+        if (len(lineAccumulator) >= linesNeeded):
+            try:
+                resultLineAcc.append(epochConversion(lineAccumulator,
+                                                     next(timeStamps).strftime("%Y-%m-%dT%H:%M:%S")))
+                lineAccumulator.clear()
+            except IndexError:
+                if not noConsoleOutput:
+                    print("ERROR: Line around line number" + lineCount + " seems corrupted and missing a value. "
+                                                                     "File conversion was aborted.")
+                return False
+            except AttributeError:
+                if not noConsoleOutput:
+                    print("ERROR: time stamp creation failed, check sample rate defined equals the program defined sampling "
+                      "rate ")
+                return False
+        if len(resultLineAcc) >= WRITE_BUFFER:
+            with profiler.stage("write"):
+                output.write(resultLineAcc)
+            resultLineAcc.clear()
+    # write the remaining details into the output file
+    if resultLineAcc:
+        with profiler.stage("write"):
+            output.write(resultLineAcc)
+    profiler.count("samples", lineCount)
+    return True
 
 def epochConversion(lines, timestamp):
     """
@@ -230,46 +469,499 @@ def epochConversion(lines, timestamp):
     resultLine = "\n{}\t{}\t{}".format(timestamp, "{0:.1f}".format(average), "{0:.2f}".format(imputedPerc))
     return resultLine
 
-def writePart(outfile, content, noConsoleOutput=False):
+def workFileVectorized(file, epoch, output, daylightSavingsTime=False, noConsoleOutput=False, binaryOutput=None):
     """
-    takes a path to a file and appends content  (list of strings) to it
-    :param outfile: absolute path to write to
-    :param content: content that should be appended
-    :param noConsoleOutput: whether errors should be displayed
-    :return: none
+    Vectorized counterpart to the line loop in workFile. Converts the opened file chunk wise with epochChunks and
+    appends the results to the output file. As in the loop, lines left over at the end of the file, that do not fill
+    a whole epoch, are discarded.
+    :param file: the input file opened with fileReader.openLines, positioned at its start
+    :param epoch: the new epoch in seconds to convert to
+    :param output: the OutputFile the results are written to
+    :param daylightSavingsTime: whether the timestamps should be adjusted for daylight savings time
+    :param noConsoleOutput: whether or not the function should output errors to the console
+    :param binaryOutput: SidecarFile the results are added to as well, None to only write the text file
+    :return: True if the file was converted, False if the conversion was aborted
     """
-    file = open(outfile, "a")
+    return workFileEpochs(file, [epoch], [output], daylightSavingsTime, noConsoleOutput,
+                          [binaryOutput] if binaryOutput != None else None)
+
+
+def workFileEpochs(file, epochs, outputs, daylightSavingsTime=False, noConsoleOutput=False, binaryOutputs=None):
+    """
+    workFileVectorized for several epochs at once. The file is read and parsed a single time, see multiEpochChunks,
+    and every epoch is written to its own output file.
+    :param file: the input file opened with fileReader.openLines, positioned at its start
+    :param epochs: list of the epochs in seconds to convert to
+    :param outputs: list of the OutputFiles the results are written to, one per epoch
+    :param daylightSavingsTime: whether the timestamps should be adjusted for daylight savings time
+    :param noConsoleOutput: whether or not the function should output errors to the console
+    :param binaryOutputs: list of the SidecarFiles the results are added to as well, None to only write the text files
+    :return: True if the file was converted, False if the conversion was aborted
+    """
+    headerLine = file.readline()
+    if not headerLine:
+        return True
+    for epoch, output in zip(epochs, outputs):
+        output.write([header(headerLine, epoch)])
     try:
-        for line in content:
-            file.write(line)
-    except:
+        for results in multiEpochChunks(file, headerLine, epochs, daylightSavingsTime):
+            for k in range(len(results)):
+                timeStamps, averages, imputedPercs = results[k]
+                with profiler.stage("format"):
+                    lines = formatEpochLines(timeStamps, averages, imputedPercs)
+                with profiler.stage("write"):
+                    outputs[k].write(lines)
+                if binaryOutputs != None:
+                    with profiler.stage("binary"):
+                        binaryOutputs[k].add(timeStamps, averages, imputedPercs)
+    except AttributeError:
         if not noConsoleOutput:
-            print("ERROR: Failed to write to: " + outfile + " please check file.")
-    finally:
-        file.close
+            print("ERROR: time stamp creation failed, check sample rate defined equals the program defined sampling "
+                  "rate ")
+        return False
+    return True
+
+
+def epochChunks(file, headerLine, epoch, daylightSavingsTime=False):
+    """
+    Reads the raw lines following the header in chunks of CHUNK_EPOCHS output epochs and converts each chunk with
+    convertChunk. A ragged end, that does not fill a whole epoch, is dropped.
+    :param file: the input file opened with fileReader.openLines, positioned after the header line
+    :param headerLine: the header line of the input file, used for the time stamps
+    :param epoch: the new epoch in seconds to convert to
+    :param daylightSavingsTime: whether the timestamps should be adjusted for daylight savings time
+    :return: generator of (time stamps, averages, fractions of imputed values) tuples as returned by convertChunk
+    """
+    for results in multiEpochChunks(file, headerLine, [epoch], daylightSavingsTime):
+        yield results[0]
+
+
+def multiEpochChunks(file, headerLine, epochs, daylightSavingsTime=False):
+    """
+    epochChunks for several epochs at once. Every chunk holds a whole number of epochs of each of the epochs and about
+    CHUNK_EPOCHS of the shortest one. It is parsed once and then averaged into every epoch with convertChunks.
+    :param file: the input file opened with fileReader.openLines, positioned after the header line
+    :param headerLine: the header line of the input file, used for the time stamps
+    :param epochs: list of the epochs in seconds to convert to
+    :param daylightSavingsTime: whether the timestamps should be adjusted for daylight savings time
+    :return: generator of lists with a tuple as returned by convertChunk for every epoch
+    """
+    linesNeeded = [int(epoch / EPOCH_TIME) for epoch in epochs]
+    commonLines = 1 # the least common multiple of the epoch lengths
+    for needed in linesNeeded:
+        commonLines = commonLines * needed // math.gcd(commonLines, needed)
+    chunkLines = commonLines * max(1, min(linesNeeded) * CHUNK_EPOCHS // commonLines)
+    lines = []
+    lineIndex = 0 # index of the first line of the current chunk
+    block = file.readBlock()
+    while block:
+        lines.extend(block)
+        while len(lines) >= chunkLines:
+            yield convertChunks(lines[:chunkLines], headerLine, [lineIndex // needed for needed in linesNeeded],
+                                linesNeeded, daylightSavingsTime)
+            lineIndex += chunkLines
+            del lines[:chunkLines]
+        block = file.readBlock()
+    # the last chunk, its ragged ends are dropped by convertChunks
+    if lines:
+        yield convertChunks(lines, headerLine, [lineIndex // needed for needed in linesNeeded], linesNeeded,
+                            daylightSavingsTime)
+
+
+def convertChunk(lines, headerLine, epochIndex, linesNeeded, daylightSavingsTime=False):
+    """
+    Converts a chunk of raw lines into epochs.
+    :param lines: list of raw lines, starting at the beginning of an epoch
+    :param headerLine: the header line of the input file, used for the time stamps
+    :param epochIndex: index of the first epoch of this chunk within the file
+    :param linesNeeded: number of raw lines per epoch
+    :param daylightSavingsTime: whether the timestamps should be adjusted for daylight savings time
+    :return: tuple of the time stamps (datetime64 array), the averages and the fractions of imputed values (lists)
+    """
+    return convertChunks(lines, headerLine, [epochIndex], [linesNeeded], daylightSavingsTime)[0]
+
+
+def convertChunks(lines, headerLine, epochIndices, linesNeeded, daylightSavingsTime=False):
+    """
+    Converts a chunk of raw lines into several epochs, the lines are only parsed once. Every epoch is averaged from the
+    parsed lines in line order, as epochConversion does, so the results equal a conversion into that epoch alone.
+    :param lines: list of raw lines, starting at the beginning of an epoch of every epoch length
+    :param headerLine: the header line of the input file, used for the time stamps
+    :param epochIndices: list of the indices of the first epoch of this chunk within the file, one per epoch length
+    :param linesNeeded: list of the number of raw lines per epoch
+    :param daylightSavingsTime: whether the timestamps should be adjusted for daylight savings time
+    :return: list of the tuples convertChunk returns, one per epoch length
+    """
+    profiler.count("samples", len(lines))
+    with profiler.stage("parse"):
+        values, imputed, valid = loadColumns(lines)
+    results = []
+    for epochIndex, needed in zip(epochIndices, linesNeeded):
+        with profiler.stage("average"):
+            averages, imputedPercs = epochConversionArrays(values, imputed, valid, needed)
+        with profiler.stage("timestamps"):
+            # offset of the first line of each epoch, counted from 1 after the header, as in the loop engine
+            offsets = (epochIndex + np.arange(len(averages), dtype=np.int64)) * needed + 1
+            timeStamps = getTimeStampArray(headerLine, offsets, daylightSavingsTime)
+        results.append((timeStamps, averages, imputedPercs))
+    return results
+
+
+def formatEpochLines(timeStamps, averages, imputedPercs):
+    """
+    Formats converted epochs as lines of the output file, the same lines epochConversion creates.
+    :param timeStamps: datetime64 array of the epoch time stamps
+    :param averages: list of the epoch averages
+    :param imputedPercs: list of the fractions of imputed values
+    :return: list of lines
+    """
+    timeStrings = np.datetime_as_string(timeStamps, unit="s")
+    return ["\n{}\t{:.1f}\t{:.2f}".format(timeStrings[n], averages[n], imputedPercs[n]) for n in range(len(averages))]
+
+
+def writtenValues(numbers, digits):
+    """
+    Rounds numbers the way formatEpochLines writes them, so that they equal the numbers read back from the output file.
+    :param numbers: list of numbers
+    :param digits: number of decimal digits written
+    :return: float64 array of the rounded numbers
+    """
+    return np.array(["{:.{}f}".format(number, digits) for number in numbers], dtype=np.float64)
+
+
+def loadColumns(lines):
+    """
+    Loads the value and imputed columns of raw lines into numpy arrays, keeping one entry per line. Lines that
+    epochConversion would skip are marked as not valid.
+    :param lines: list of raw lines in the format value,imputed
+    :return: tuple of three arrays: the values, whether the value was imputed and whether the line was valid
+    """
+    try:
+        table = np.loadtxt(lines, delimiter=",", dtype=[("value", "f8"), ("imputed", "U8")], comments=None, ndmin=1)
+        if len(table) == len(lines):
+            return table["value"], np.char.strip(table["imputed"]) == "1", np.ones(len(lines), dtype=bool)
+    except ValueError:
+        pass
+    # at least one line is corrupted or empty, parse line by line as epochConversion does
+    values = np.zeros(len(lines), dtype=np.float64)
+    imputed = np.zeros(len(lines), dtype=bool)
+    valid = np.zeros(len(lines), dtype=bool)
+    for i in range(len(lines)):
+        lineContent = str(lines[i]).split(",")
+        if (len(lineContent) != 2) | (lineContent[0] == ""):
+            continue
+        values[i] = float(lineContent[0])
+        imputed[i] = lineContent[1].strip() == "1"
+        valid[i] = True
+    return values, imputed, valid
+
+
+def epochConversionArrays(values, imputed, valid, linesNeeded):
+    """
+    Vectorized version of epochConversion for a whole block of lines. The arrays are reshaped into one row per epoch,
+    a ragged end that does not fill a whole epoch is dropped. The values are summed column by column so that each
+    epoch is summed in line order, exactly as sum() does in epochConversion.
+    :param values: array of values, one per line
+    :param imputed: boolean array, whether the value of a line was imputed
+    :param valid: boolean array, whether a line contained a value
+    :param linesNeeded: number of lines per epoch
+    :return: tuple of lists with the average and the fraction of imputed values per epoch, -1 if an epoch had no values
+    """
+    epochs = len(values) // linesNeeded
+    size = epochs * linesNeeded
+    values = values[:size].reshape(epochs, linesNeeded)
+    imputed = imputed[:size].reshape(epochs, linesNeeded)
+    valid = valid[:size].reshape(epochs, linesNeeded)
+    sums = np.zeros(epochs, dtype=np.float64)
+    for column in range(linesNeeded):
+        sums += np.where(valid[:, column], values[:, column], 0.0)
+    counts = valid.sum(axis=1)
+    imputedCounts = (imputed & valid).sum(axis=1)
+    hasValues = counts > 0
+    averages = np.full(epochs, -1.0)
+    imputedPercs = np.full(epochs, -1.0)
+    averages[hasValues] = sums[hasValues] / counts[hasValues]
+    imputedPercs[hasValues] = imputedCounts[hasValues] / counts[hasValues]
+    return averages.tolist(), imputedPercs.tolist()
+
+
+def removeFile(path):
+    """
+    :param path: path of a file to remove, nothing happens if it does not exist
+    :return: none
+    """
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class OutputFile:
+    """
+    Buffered output file that keeps a single handle open for a whole conversion. It is written under a temporary name
+    next to the final file and only renamed to the final name by commit, so interrupted or failed conversions never
+    leave a partial file, that the -o flag would then skip.
+    """
+
+    def __init__(self, path, bufferSize=WRITE_BUFFER_SIZE):
+        """
+        :param path: absolute path of the final output file
+        :param bufferSize: size of the write buffer in bytes
+        """
+        self.path = path
+        self.tempPath = path + ".part"
+        removeFile(self.tempPath) # left over by a run that was killed
+        self.file = open(self.tempPath, "w", buffering=bufferSize)
+
+    def write(self, content):
+        """
+        appends content (list of strings) to the file
+        :param content: content that should be appended
+        :return: none
+        """
+        self.file.writelines(content)
+
+    def commit(self):
+        """
+        closes the file and atomically moves it to its final name
+        :return: none
+        """
+        self.file.close()
+        os.replace(self.tempPath, self.path)
+
+    def discard(self):
+        """
+        closes and removes the temporary file, leaving no output behind
+        :return: none
+        """
+        self.file.close()
+        removeFile(self.tempPath)
+
+
+class SidecarFile:
+    """
+    Binary copy of an output file, a .npy file of SIDECAR_DTYPE records that can be memory mapped by readers instead of
+    parsing the text file. The records are written to a temporary file as they are converted, so the memory use does
+    not grow with the file. commit puts the .npy header in front of them, which needs their number, and like
+    OutputFile only then moves the file to its final name.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: absolute path of the final binary file
+        """
+        self.path = path
+        self.tempPath = path + ".part"
+        self.recordPath = path + ".records.part"
+        # left over by a run that was killed
+        removeFile(self.tempPath)
+        removeFile(self.recordPath)
+        self.file = open(self.recordPath, "wb")
+        self.count = 0
+
+    def add(self, timeStamps, averages, imputedPercs):
+        """
+        appends converted epochs, rounded as they are written to the text file
+        :param timeStamps: datetime64 array of the epoch time stamps
+        :param averages: list of the epoch averages
+        :param imputedPercs: list of the fractions of imputed values
+        :return: none
+        """
+        chunk = np.empty(len(averages), dtype=SIDECAR_DTYPE)
+        chunk["time"] = timeStamps
+        chunk["value"] = writtenValues(averages, 1)
+        chunk["imputed"] = writtenValues(imputedPercs, 2)
+        self.file.write(chunk.tobytes())
+        self.count += len(chunk)
+
+    def commit(self):
+        """
+        writes the header and the records to the .npy file and atomically moves it to its final name
+        :return: none
+        """
+        self.file.close()
+        with open(self.tempPath, "wb") as file:
+            np.lib.format.write_array_header_1_0(file, {"descr": np.lib.format.dtype_to_descr(np.dtype(SIDECAR_DTYPE)),
+                                                        "fortran_order": False, "shape": (self.count,)})
+            with open(self.recordPath, "rb") as records:
+                shutil.copyfileobj(records, file, WRITE_BUFFER_SIZE)
+        os.replace(self.tempPath, self.path)
+        removeFile(self.recordPath)
+
+    def discard(self):
+        """
+        closes and removes the temporary files, leaving no binary copy behind
+        :return: none
+        """
+        self.file.close()
+        removeFile(self.tempPath)
+        removeFile(self.recordPath)
+
+
+def hashFile(filename):
+    """
+    :param filename: path of the file to hash
+    :return: the sha1 hex digest of the file contents
+    """
+    digest = hashlib.sha1()
+    with open(filename, "rb") as file:
+        block = file.read(fileReader.READ_BLOCK_SIZE)
+        while block:
+            digest.update(block)
+            block = file.read(fileReader.READ_BLOCK_SIZE)
+    return digest.hexdigest()
+
+
+def getFingerprint(filename, previous=None):
+    """
+    Identifies the contents of an input file by its size, modification time and hash. The hash is only computed if
+    size or modification time differ from the previous fingerprint, otherwise the previous hash is reused.
+    :param filename: path of the input file
+    :param previous: fingerprint of an earlier run, None if there is none
+    :return: dict with the keys size, mtime and hash
+    """
+    stat = os.stat(filename)
+    fingerprint = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": None}
+    if (previous != None) and (previous["size"] == fingerprint["size"]) and (previous["mtime"] == fingerprint["mtime"]):
+        fingerprint["hash"] = previous["hash"]
+    else:
+        fingerprint["hash"] = hashFile(filename)
+    return fingerprint
+
+
+class Manifest:
+    """
+    Record of the conversions of earlier runs into an output directory, stored as one JSON object per line in
+    MANIFEST_NAME. Every finished conversion appends the fingerprint of its input, the parameters it was converted with
+    and its status, the last entry of an input counts. A file only needs to be converted again if one of these changed,
+    its last conversion failed or never finished, or its output is gone.
+    """
+
+    def __init__(self, outdir):
+        """
+        :param outdir: the output directory the manifest belongs to
+        """
+        self.path = os.path.join(os.path.realpath(outdir), MANIFEST_NAME)
+        self.entries = {}
+        try:
+            with open(self.path, "r") as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue # a line cut off by an interrupted run
+                    self.entries[entry["input"]] = entry
+        except FileNotFoundError:
+            pass
+        self.file = open(self.path, "a")
+
+    def isCurrent(self, filename, parameters, outputFile):
+        """
+        :param filename: path of the input file
+        :param parameters: the parameters of the conversion, see getManifestParameters
+        :param outputFile: path the output file would be written to, a list of paths for several epochs
+        :return: whether the input file was already converted successfully with these parameters and is unchanged
+        """
+        entry = self.entries.get(filename)
+        outputFiles = outputFile if isinstance(outputFile, list) else [outputFile]
+        if (entry == None) or (entry["status"] != STATUS_CONVERTED) or (entry["parameters"] != parameters) or \
+                (entry["output"] != outputFile) or not all(os.path.isfile(output) for output in outputFiles):
+            return False
+        if parameters["binary"] and not all(os.path.isfile(getSidecarName(output)) for output in outputFiles):
+            return False
+        try:
+            fingerprint = getFingerprint(filename, entry["fingerprint"])
+        except OSError:
+            return False
+        if (fingerprint["size"] != entry["fingerprint"]["size"]) or (fingerprint["hash"] != entry["fingerprint"]["hash"]):
+            return False
+        if fingerprint["mtime"] != entry["fingerprint"]["mtime"]:
+            # only the modification time changed, remember the new one so the file does not need to be hashed again
+            self.record(filename, fingerprint, parameters, outputFile, STATUS_CONVERTED)
+        return True
+
+    def record(self, filename, fingerprint, parameters, outputFile, status):
+        """
+        appends the result of a conversion, it is written to disk immediately so it survives an interrupted run
+        :param filename: path of the input file
+        :param fingerprint: fingerprint of the input file taken before the conversion, see getFingerprint
+        :param parameters: the parameters of the conversion, see getManifestParameters
+        :param outputFile: path of the output file, a list of paths for several epochs
+        :param status: the result of workFile
+        :return: none
+        """
+        entry = {"input": filename, "fingerprint": fingerprint, "parameters": parameters, "output": outputFile,
+                 "status": status, "finished": datetime.datetime.now().isoformat(timespec="seconds")}
+        self.entries[filename] = entry
+        self.file.write(json.dumps(entry, sort_keys=True) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def getManifestParameters(epoch, daylightSavingsTime, prefix, keepName, sidecar):
+    """
+    :return: dict of the workFile parameters, that change the output of a conversion
+    """
+    return {"epoch": epoch, "daylightSavingsTime": daylightSavingsTime, "prefix": prefix, "keepName": keepName,
+            "binary": sidecar}
 
 
 def getFiles(inputFiles):
     """
     get files takes a plain text file containing paths and will return a list of absolute paths of the paths
-    specified in the file.
+    specified in the file. A directory is searched for .csv and .csv.gz files instead.
     :param inputFiles: the file containing the paths
     :return: a list object containing the absolute paths
     """
-    fileList = []
-    if os.path.isfile(inputFiles):
-        file = open(inputFiles, "r")
-        dir = os.path.dirname(os.path.realpath(inputFiles))
-        for line in file:
-            fileList.append(os.path.join(dir,line.strip(" \n\t")))
-    else:
-        # it is a directory
-        for file in os.listdir(inputFiles):
-            fileName = os.path.join(inputFiles, file)
-            if (os.path.isfile(fileName) & (
-                    (os.path.splitext(fileName)[1] == ".csv") | (fileName.endswith(".csv.gz")))):
-                fileList.append(fileName)
-    return fileList
+    return fileReader.listFiles(inputFiles, (".csv", ".csv.gz"))
+
+
+def convertFile(task):
+    """
+    Converts a single file of a batch run with workFile and reports the same status messages as a serial run. It is
+    used by main both serially and in the worker processes, in which case the console output is captured and returned,
+    so that the messages of one file are printed together.
+    :param task: tuple of (filename, epoch, outdir, prefix, keepName, daylightSavingsTime, noConsoleOutput, noOverwrite,
+    engine, bufferSize, sidecar, takeFingerprint, captureOutput, profile), see workFile for the meaning of the values
+    :return: tuple of (filename, status, console output, fingerprint, profile report), the console output is empty if
+    it was not captured, the fingerprint of the input file taken before the conversion is None if takeFingerprint is
+    False and the report of the profiler is None if profile is False
+    """
+    file, epoch, outdir, prefixIndex, keepName, daylightSavingsTime, noConsoleOutput, noOverwrite, engine, bufferSize, \
+        sidecar, takeFingerprint, captureOutput, profile = task
+    output = io.StringIO()
+    fingerprint = None
+    with contextlib.redirect_stdout(output) if captureOutput else contextlib.nullcontext(), \
+            profiler.profile(file) if profile else contextlib.nullcontext() as fileProfile:
+        start = datetime.datetime.now()
+        if not noConsoleOutput:
+            print("STATUS: Analyzing file " + file)
+        try:
+            if takeFingerprint:
+                with profiler.stage("fingerprint"):
+                    fingerprint = getFingerprint(file)
+            status = workFile(file, epoch, outdir, prefixIndex, keepName, daylightSavingsTime, noConsoleOutput,
+                              noOverwrite, engine, bufferSize, sidecar)
+        except FileNotFoundError:
+            status = STATUS_FAILED
+            if not noConsoleOutput:
+                print("ERROR: The file: " + file + " could not be found under the specified path.")
+                traceback.print_exc(file=sys.stdout)
+        except Exception:
+            status = STATUS_FAILED
+            if not noConsoleOutput:
+                print("ERROR: The file: " + file + " could not be converted.")
+                traceback.print_exc(file=sys.stdout)
+        finish = datetime.datetime.now()
+        timeUsed = finish - start
+        if not noConsoleOutput:
+            if PREFIX_SET:
+                print("STATUS: Finished file " + prefixIndex + " , saved in " + os.path.abspath(outdir) + " in " + str(timeUsed))
+            else:
+                print("STATUS: Finished file " + file + " , saved in " + os.path.abspath(outdir) + " in " + str(timeUsed))
+    return file, status, output.getvalue(), fingerprint, fileProfile.report() if fileProfile != None else None
 
 
 def main():
@@ -281,9 +973,10 @@ def main():
     #parser.add_argument("-f", dest= "fileSet",  action='claimInput', const= help= " If this flag is set, IL may be
     #  file locations directly entered into the command line.")
     parser.add_argument("inlis", metavar="IL",  help="A plain text document containing the list of files to be converted")
-    parser.add_argument("epochTime", metavar="t", type= int, help="epoch duration to convert to. "
+    parser.add_argument("epochTime", metavar="t", type= int, nargs="+", help="epoch duration to convert to. "
                                                        "This should be a multiple of the orginal epoch time of 5 "
-                                                                  "seconds.")
+                                                                  "seconds. Several epochs are converted in a single "
+                                                                  "pass over every file.")
     parser.add_argument("outputDir", metavar="OD", help="output directory for the results")
     parser.add_argument("-p", metavar="Prefix", required= False, help= "prefix for the output files. Otherwise the "
                                                                        "old name will be used, with the addition of "
@@ -300,17 +993,36 @@ def main():
     parser.add_argument("-n", action="store_true", help="This option should be selected if no console output should be "
                                                         "made, e.g. when no non-shared console is available. In this "
                                                         "case only error messages will be displayed.")
+    parser.add_argument("-e", dest="engine", choices=ENGINES, default=DEFAULT_ENGINE, help="Conversion engine to use. "
+                                                        "numpy is vectorized and the default if numpy is installed, "
+                                                        "loop is the line by line reference implementation.")
+    parser.add_argument("--buffer", type=int, default=WRITE_BUFFER_SIZE, help="Size of the output file buffer in "
+                                                                              "bytes.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes converting files in "
+                                                            "parallel. 0 uses all available cores.")
+    parser.add_argument("--binary", action="store_true", help="Also write a binary copy of every output file "
+                                                              "([output name].npy), that chronPercentile reads "
+                                                              "instead of the text file. Needs the numpy engine.")
+    parser.add_argument("--manifest", action="store_true", help="Record every conversion in " + MANIFEST_NAME + " in "
+                                                                "the output directory and skip files, that are "
+                                                                "unchanged since their last successful conversion "
+                                                                "with the same parameters.")
+    parser.add_argument("--profile", type=str, metavar="FILE", help="Measure the time spent in every stage of the "
+                                                                    "conversion and write a JSON report of every file "
+                                                                    "and of all files together to FILE.")
     args = parser.parse_args()
     inputFiles = args.inlis
-    epoch = int(args.epochTime)
+    epochs = sorted(set(args.epochTime))
+    # a single epoch is passed on as a number, so that its manifest entries stay the same
+    epoch = epochs[0] if len(epochs) == 1 else epochs
     outdir = args.outputDir
 
     # initial sanity check
-    if not((epoch % EPOCH_TIME) == 0):
+    if not all((epochTime % EPOCH_TIME) == 0 for epochTime in epochs):
         if(not args.n):
             print("ERROR: entered epoch time does not fit base epoch time")
         return
-    if (epoch / EPOCH_TIME < 1):
+    if (epochs[0] / EPOCH_TIME < 1):
         if not args.n:
             print("ERROR: requested epoch to short to be generated from given data")
         return
@@ -332,34 +1044,72 @@ def main():
     if args.p:
         prefix = args.p
 
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+
+    # the prefix indices are handed out in list order before any conversion, so they do not depend on the job count
     index = 0
+    tasks = []
+    taskParameters = []
+    statuses = {STATUS_CONVERTED: [], STATUS_SKIPPED: [], STATUS_FAILED: []}
+    manifest = Manifest(outdir) if args.manifest else None
     for file in inList:
         if os.path.dirname(file) == outdir:
             if not args.n:
                 print("ERROR: Due to the input and output directory being the same this file could not be processed, "
                   "withouth risking overwriting.")
+            statuses[STATUS_FAILED].append(file)
             continue
-        start= datetime.datetime.now()
-        if not args.n:
-            print("STATUS: Analyzing file " + file)
         if args.p:
             prefixIndex = "{}_{:04d}".format(prefix, index)
         else:
             prefixIndex = ""
-        try:
-            workFile(file, epoch, outdir, prefixIndex, args.id, args.d, args.n, args.o)
-        except FileNotFoundError:
-            if not args.n:
-                print("ERROR: The file: " + file + " could not be found under the specified path.")
-                traceback.print_exc()
-        finish = datetime.datetime.now()
-        timeUsed = finish - start
-        if not args.n:
-            if PREFIX_SET:
-                print("STATUS: Finished file " + prefixIndex + " , saved in " + os.path.abspath(outdir) + " in " + str(timeUsed))
-            else:
-                print("STATUS: Finished file " + file + " , saved in " + os.path.abspath(outdir) + " in " + str(timeUsed))
         index = index +1
+        parameters = getManifestParameters(epoch, args.d, prefixIndex, args.id, args.binary)
+        outputFile = getOutFileNames(file, outdir, epoch, prefixIndex, args.id)
+        outputFile = outputFile[0] if len(outputFile) == 1 else outputFile
+        if (manifest != None) and manifest.isCurrent(file, parameters, outputFile):
+            if not args.n:
+                print("STATUS: File " + file + " is unchanged since its last conversion, it will be skipped.")
+            statuses[STATUS_SKIPPED].append(file)
+            continue
+        tasks.append((file, epoch, outdir, prefixIndex, args.id, args.d, args.n, args.o, args.engine, args.buffer,
+                      args.binary, manifest != None, jobs > 1, args.profile != None))
+        taskParameters.append((parameters, outputFile))
+
+    pool = None
+    reports = []
+    runProfile = profiler.Profile("run") # wall time of the whole batch, the files are profiled on their own
+    try:
+        if jobs > 1:
+            pool = multiprocessing.Pool(min(jobs, max(len(tasks), 1)))
+            # results arrive in list order, the output of every file is printed as one block
+            results = pool.imap(convertFile, tasks)
+        else:
+            results = (convertFile(task) for task in tasks)
+        for (parameters, outputFile), (file, status, output, fingerprint, report) in zip(taskParameters, results):
+            print(output, end="")
+            if report != None:
+                reports.append(report)
+            statuses[status].append(file)
+            if (manifest != None) and (fingerprint != None) and (status != STATUS_SKIPPED):
+                manifest.record(file, fingerprint, parameters, outputFile, status)
+    finally:
+        if pool != None:
+            pool.close()
+            pool.join()
+        if manifest != None:
+            manifest.close()
+    if args.profile != None:
+        runProfile.count("files", len(tasks))
+        runProfile.count("jobs", min(jobs, max(len(tasks), 1)))
+        profiler.writeReport(args.profile, runProfile.report(), reports)
+
+    if not args.n:
+        print("STATUS: Batch finished: {} converted, {} skipped, {} failed.".format(len(statuses[STATUS_CONVERTED]),
+                                                                                 len(statuses[STATUS_SKIPPED]),
+                                                                                 len(statuses[STATUS_FAILED])))
+        for file in statuses[STATUS_FAILED]:
+            print("ERROR: Failed to convert " + file)
 
 
 # main script
@@ -2,76 +2,227 @@
 This script should determine whether a person is more a morning or evening chronotype
 For this it takes the accelFeature output and uses the hourly data
 """
+import argparse
 import os
-EXPECTED_HEADER = "ID\tDate\tDay Of The Week\tMean (mg)\tStandard Deviation (mg)\tMedian (mg)\tQ1 (mg)\tQ3 (mg)\t" \
-                 "Mean HR00\tStandard Deviation HR00\tMedian HR00\tQ1 HR00\tQ3 HR00\t" \
-                 "Mean HR01\tStandard Deviation HR01\tMedian HR01\tQ1 HR01\tQ3 HR01\t" \
-                 "Mean HR02\tStandard Deviation HR02\tMedian HR02\tQ1 HR02\tQ3 HR02\t" \
-                 "Mean HR03\tStandard Deviation HR03\tMedian HR03\tQ1 HR03\tQ3 HR03\t" \
-                 "Mean HR04\tStandard Deviation HR04\tMedian HR04\tQ1 HR04\tQ3 HR04\t" \
-                 "Mean HR05\tStandard Deviation HR05\tMedian HR05\tQ1 HR05\tQ3 HR05\t" \
-                 "Mean HR06\tStandard Deviation HR06\tMedian HR06\tQ1 HR06\tQ3 HR06\t" \
-                 "Mean HR07\tStandard Deviation HR07\tMedian HR07\tQ1 HR07\tQ3 HR07\t" \
-                 "Mean HR08\tStandard Deviation HR08\tMedian HR08\tQ1 HR08\tQ3 HR08\t" \
-                 "Mean HR09\tStandard Deviation HR09\tMedian HR09\tQ1 HR09\tQ3 HR09\t" \
-                 "Mean HR10\tStandard Deviation HR10\tMedian HR10\tQ1 HR10\tQ3 HR10\t" \
-                 "Mean HR11\tStandard Deviation HR11\tMedian HR11\tQ1 HR11\tQ3 HR11\t" \
-                 "Mean HR12\tStandard Deviation HR12\tMedian HR12\tQ1 HR12\tQ3 HR12\t" \
-                 "Mean HR13\tStandard Deviation HR13\tMedian HR13\tQ1 HR13\tQ3 HR13\t" \
-                 "Mean HR14\tStandard Deviation HR14\tMedian HR14\tQ1 HR14\tQ3 HR14\t" \
-                 "Mean HR15\tStandard Deviation HR15\tMedian HR15\tQ1 HR15\tQ3 HR15\t" \
-                 "Mean HR16\tStandard Deviation HR16\tMedian HR16\tQ1 HR16\tQ3 HR16\t" \
-                 "Mean HR17\tStandard Deviation HR17\tMedian HR17\tQ1 HR17\tQ3 HR17\t" \
-                 "Mean HR18\tStandard Deviation HR18\tMedian HR18\tQ1 HR18\tQ3 HR18\t" \
-                 "Mean HR19\tStandard Deviation HR19\tMedian HR19\tQ1 HR19\tQ3 HR19\t" \
-                 "Mean HR20\tStandard Deviation HR20\tMedian HR20\tQ1 HR20\tQ3 HR20\t" \
-                 "Mean HR21\tStandard Deviation HR21\tMedian HR21\tQ1 HR21\tQ3 HR21\t" \
-                 "Mean HR22\tStandard Deviation HR22\tMedian HR22\tQ1 HR22\tQ3 HR22\t" \
-                 "Mean HR23\tStandard Deviation HR23\tMedian HR23\tQ1 HR23\tQ3 HR23\t" \
-                 "Daylight Savings\n"
+import numpy as np
+import featureReader
+EXPECTED_HEADER = featureReader.ACCELFEAT_HEADER
+HOURS = featureReader.HOURS
+MORNING_HOURS = (6, 12) # default hour windows compared by evalChrono, the end hour is not included
+EVENING_HOURS = (18, 24)
+CHRONOTYPE_MARGIN = 0.1 # how much more active a window needs to be to decide the chronotype
+MORNING_TYPE = "Morning"
+EVENING_TYPE = "Evening"
+INTERMEDIATE_TYPE = "Intermediate"
+OUTPUT_HEADER = "ID\tDays\tMorning Mean\tEvening Mean\tMorning Spike\tEvening Spike\tMorning Low\tEvening Low\t" \
+                "Peak Hour\tChronotype\n"
 
 
+class HourlyData:
+    """
+    The hourly means of all participants, summed up over their days. Participant k has measured
+    counts[k, h] days in hour h, whose means add up to sums[k, h].
+    """
+    __slots__ = ("ids", "days", "sums", "counts")
+
+    def __init__(self, ids, days, sums, counts):
+        """
+        :param ids: list of the participant ids
+        :param days: number of days of every participant
+        :param sums: (participants x 24) array of the summed hourly means
+        :param counts: (participants x 24) array of the number of measured days of every hour
+        """
+        self.ids = ids
+        self.days = days
+        self.sums = sums
+        self.counts = counts
+
+    def __len__(self):
+        return len(self.ids)
+
+    def getProfiles(self):
+        """
+        :return: (participants x 24) array of the average day of every participant, NaN for hours without measurements
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.counts > 0, self.sums / self.counts, np.nan)
+
 
 def readData(filePath):
     """
-
-    :param filePath:
-    :return:
+    Reads the hourly means of all participants of an accelFeature file
+    :param filePath: path of the feature file
+    :return: dictionary of the participant id to a tuple of the dates of its days and a (days x 24) array of the
+    hourly means, NaN where a mean is missing
     """
-    data = {}
     if "tsv" not in os.path.splitext(filePath)[1]:
         raise AttributeError("Wrong file format. Expecting .tsv, found {} .  Please change input!".format(
             os.path.splitext(filePath)[1]))
+    return featureReader.readFeatureFile(filePath)
+
+def getHourlyData(data):
+    """
+    Sums up the days of every participant, all participants at once.
+    :param data: the data as returned by readData
+    :return: HourlyData of the participants
+    """
+    ids = list(data)
+    days = np.array([len(data[id][0]) for id in ids], dtype=np.int64)
+    if not ids:
+        return HourlyData(ids, days, np.zeros((0, HOURS)), np.zeros((0, HOURS), dtype=np.int64))
+    means = np.concatenate([data[id][1] for id in ids])
+    starts = np.zeros(len(ids), dtype=np.int64)
+    starts[1:] = np.cumsum(days)[:-1]
+    measured = ~np.isnan(means)
+    sums = np.add.reduceat(np.where(measured, means, 0), starts, axis=0)
+    counts = np.add.reduceat(measured.astype(np.int64), starts, axis=0)
+    return HourlyData(ids, days, sums, counts)
+
+def isValidWindow(startHour, endHour):
+    """
+    :param startHour: first hour of the window
+    :param endHour: hour the window ends at, not included
+    :return: whether the start is an hour from 0 to 23, the end one from 1 to 24 and both differ
+    """
+    return (0 <= startHour < HOURS) and (1 <= endHour <= HOURS) and (startHour != endHour)
 
-    with open(filePath, "r+")as featureData:
-        # check correct file contents
-        header = featureData.readline()
-        if not (EXPECTED_HEADER == header):
-            # basics dont seem to be fullfilled
-            raise AttributeError("File seems to not fullfill the basic standards expected. (HEADER error)")
-
-        for line in featureData:
-            # read all accelData
-            values = line.split("\t")
-            #check for expected length of data row
-            if len(values) != 128:
-                continue
-            id =  values[0]
-            if id not in data:
-                data[id] = [].append(values[1:])
-            else:
-                data[id] = data[id].append(values[1:])
+def getHours(startHour, endHour):
+    """
+    :param startHour: first hour of the window, 0 to 23
+    :param endHour: hour the window ends at, not included, 1 to 24. Windows with an end before the start wrap around
+    midnight.
+    :return: array of the hours of the window
+    """
+    if not isValidWindow(startHour, endHour):
+        raise ValueError("Invalid hour window {} to {}".format(startHour, endHour))
+    if endHour < startHour:
+        endHour += HOURS
+    return np.arange(startHour, endHour) % HOURS
 
 def hourSetAvg(startHour, endHour, dataSet):
+    """
+    :param startHour: first hour of the window
+    :param endHour: hour the window ends at, not included
+    :param dataSet: HourlyData of the participants
+    :return: array of the average hourly mean of every participant inside the window, NaN without measurements
+    """
+    hours = getHours(startHour, endHour)
+    sums = dataSet.sums[:, hours].sum(axis=1)
+    counts = dataSet.counts[:, hours].sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
 
 def hourSetSpike(startHour, endHour, dataSet):
+    """
+    :param startHour: first hour of the window
+    :param endHour: hour the window ends at, not included
+    :param dataSet: HourlyData of the participants
+    :return: array of the highest hour of the average day of every participant inside the window, NaN without
+    measurements
+    """
+    return np.fmax.reduce(hourSetData(startHour, endHour, dataSet), axis=1)
 
 def hourSetLow(startHour, endHour, dataSet):
+    """
+    :param startHour: first hour of the window
+    :param endHour: hour the window ends at, not included
+    :param dataSet: HourlyData of the participants
+    :return: array of the lowest hour of the average day of every participant inside the window, NaN without
+    measurements
+    """
+    return np.fmin.reduce(hourSetData(startHour, endHour, dataSet), axis=1)
 
 def hourSetData(startHour, endHour, dataSet):
-    # 7th field is Hour 0 and
+    """
+    :param startHour: first hour of the window
+    :param endHour: hour the window ends at, not included
+    :param dataSet: HourlyData of the participants
+    :return: (participants x hours) array of the average day of every participant inside the window
+    """
+    return dataSet.getProfiles()[:, getHours(startHour, endHour)]
 
-def evalChrono(dataSet):
+def evalChrono(dataSet, morningHours=MORNING_HOURS, eveningHours=EVENING_HOURS, margin=CHRONOTYPE_MARGIN):
+    """
+    Classifies every participant as morning or evening chronotype, by comparing the average activity during the
+    morning and the evening hours. If neither is more than margin more active than the other, the participant is of
+    the intermediate type.
+    :param dataSet: HourlyData of the participants
+    :param morningHours: tuple of the start and end hour of the morning
+    :param eveningHours: tuple of the start and end hour of the evening
+    :param margin: fraction the activity of one window needs to exceed the other one by
+    :return: dictionary of the evaluated values, each an array with one entry per participant: "morningMean",
+    "eveningMean", "morningSpike", "eveningSpike", "morningLow", "eveningLow", "peakHour" (-1 without measurements) and
+    "chronotype" (None without measurements in either window)
+    """
+    results = {"morningMean": hourSetAvg(morningHours[0], morningHours[1], dataSet),
+               "eveningMean": hourSetAvg(eveningHours[0], eveningHours[1], dataSet),
+               "morningSpike": hourSetSpike(morningHours[0], morningHours[1], dataSet),
+               "eveningSpike": hourSetSpike(eveningHours[0], eveningHours[1], dataSet),
+               "morningLow": hourSetLow(morningHours[0], morningHours[1], dataSet),
+               "eveningLow": hourSetLow(eveningHours[0], eveningHours[1], dataSet)}
+    profiles = dataSet.getProfiles()
+    measured = ~np.all(np.isnan(profiles), axis=1)
+    results["peakHour"] = np.where(measured, np.argmax(np.where(np.isnan(profiles), -np.inf, profiles), axis=1), -1)
+    chronotype = np.full(len(dataSet), INTERMEDIATE_TYPE, dtype=object)
+    chronotype[results["morningMean"] > results["eveningMean"] * (1 + margin)] = MORNING_TYPE
+    chronotype[results["eveningMean"] > results["morningMean"] * (1 + margin)] = EVENING_TYPE
+    chronotype[np.isnan(results["morningMean"]) | np.isnan(results["eveningMean"])] = None
+    results["chronotype"] = chronotype
+    return results
+
+def formatResults(dataSet, results):
+    """
+    Formats the results of evalChrono as lines of the output table
+    :param dataSet: HourlyData of the participants
+    :param results: the results as returned by evalChrono
+    :return: list of lines
+    """
+    columns = [results[name].tolist() for name in ("morningMean", "eveningMean", "morningSpike", "eveningSpike",
+                                                   "morningLow", "eveningLow")]
+    peakHours = results["peakHour"].tolist()
+    chronotypes = results["chronotype"].tolist()
+    lines = []
+    for k in range(len(dataSet)):
+        line = "{}\t{}".format(dataSet.ids[k], dataSet.days[k])
+        for column in columns:
+            line += "\t{:.3f}".format(column[k]) if not np.isnan(column[k]) else "\tNA"
+        line += "\t{}".format(peakHours[k]) if peakHours[k] >= 0 else "\tNA"
+        line += "\t{}\n".format(chronotypes[k] if chronotypes[k] != None else "NA")
+        lines.append(line)
+    return lines
+
+def main():
+    """
+    Evaluates the chronotype of every participant of an accelFeature file
+    :return: none
+    """
+    parser = argparse.ArgumentParser(description="Script to determine whether the participants of an accelerometer "
+                                                 "feature file are morning or evening chronotypes")
+    parser.add_argument("inlis", metavar="IL", help="Location of the accelerometer feature file")
+    parser.add_argument("-o", nargs="?", type=str, dest="out", const="", help="output location")
+    parser.add_argument("-m", nargs=2, type=int, dest="morning", default=list(MORNING_HOURS), metavar=("START", "END"),
+                        help="first hour and end hour (not included) of the morning, default {} {}".format(
+                            *MORNING_HOURS))
+    parser.add_argument("-e", nargs=2, type=int, dest="evening", default=list(EVENING_HOURS), metavar=("START", "END"),
+                        help="first hour and end hour (not included) of the evening, default {} {}".format(
+                            *EVENING_HOURS))
+    parser.add_argument("--margin", type=float, default=CHRONOTYPE_MARGIN, help="fraction one window needs to be more "
+                        "active than the other to decide the chronotype, default {}".format(CHRONOTYPE_MARGIN))
+    args = parser.parse_args()
+    for flag, window in (("-m", args.morning), ("-e", args.evening)):
+        if not isValidWindow(*window):
+            print("ERROR: {} needs a start hour from 0 to 23 and a different end hour from 1 to 24, found {} {}".format(
+                flag, *window))
+            return
+    dataSet = getHourlyData(readData(args.inlis))
+    lines = formatResults(dataSet, evalChrono(dataSet, args.morning, args.evening, args.margin))
+    if args.out != None and args.out != "":
+        with open(os.path.abspath(args.out), "w") as outFile:
+            outFile.write(OUTPUT_HEADER)
+            outFile.writelines(lines)
+    else:
+        print(OUTPUT_HEADER + "".join(lines), end="")
 
 
 if __name__ == "__main__":
+    main()
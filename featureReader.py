@@ -0,0 +1,114 @@
+"""Reader for the hourly means of the accelerometer feature files, shared by chronPercentile and evalAccChronType"""
+
+import numpy as np
+import fileReader
+
+ACCELFEAT_HEADER = "ID\tDate\tDay Of The Week\tMean (mg)\tStandard Deviation (mg)\tMedian (mg)\tQ1 (mg)\tQ3 (mg)\t" \
+                 "Mean HR00\tStandard Deviation HR00\tMedian HR00\tQ1 HR00\tQ3 HR00\t" \
+                 "Mean HR01\tStandard Deviation HR01\tMedian HR01\tQ1 HR01\tQ3 HR01\t" \
+                 "Mean HR02\tStandard Deviation HR02\tMedian HR02\tQ1 HR02\tQ3 HR02\t" \
+                 "Mean HR03\tStandard Deviation HR03\tMedian HR03\tQ1 HR03\tQ3 HR03\t" \
+                 "Mean HR04\tStandard Deviation HR04\tMedian HR04\tQ1 HR04\tQ3 HR04\t" \
+                 "Mean HR05\tStandard Deviation HR05\tMedian HR05\tQ1 HR05\tQ3 HR05\t" \
+                 "Mean HR06\tStandard Deviation HR06\tMedian HR06\tQ1 HR06\tQ3 HR06\t" \
+                 "Mean HR07\tStandard Deviation HR07\tMedian HR07\tQ1 HR07\tQ3 HR07\t" \
+                 "Mean HR08\tStandard Deviation HR08\tMedian HR08\tQ1 HR08\tQ3 HR08\t" \
+                 "Mean HR09\tStandard Deviation HR09\tMedian HR09\tQ1 HR09\tQ3 HR09\t" \
+                 "Mean HR10\tStandard Deviation HR10\tMedian HR10\tQ1 HR10\tQ3 HR10\t" \
+                 "Mean HR11\tStandard Deviation HR11\tMedian HR11\tQ1 HR11\tQ3 HR11\t" \
+                 "Mean HR12\tStandard Deviation HR12\tMedian HR12\tQ1 HR12\tQ3 HR12\t" \
+                 "Mean HR13\tStandard Deviation HR13\tMedian HR13\tQ1 HR13\tQ3 HR13\t" \
+                 "Mean HR14\tStandard Deviation HR14\tMedian HR14\tQ1 HR14\tQ3 HR14\t" \
+                 "Mean HR15\tStandard Deviation HR15\tMedian HR15\tQ1 HR15\tQ3 HR15\t" \
+                 "Mean HR16\tStandard Deviation HR16\tMedian HR16\tQ1 HR16\tQ3 HR16\t" \
+                 "Mean HR17\tStandard Deviation HR17\tMedian HR17\tQ1 HR17\tQ3 HR17\t" \
+                 "Mean HR18\tStandard Deviation HR18\tMedian HR18\tQ1 HR18\tQ3 HR18\t" \
+                 "Mean HR19\tStandard Deviation HR19\tMedian HR19\tQ1 HR19\tQ3 HR19\t" \
+                 "Mean HR20\tStandard Deviation HR20\tMedian HR20\tQ1 HR20\tQ3 HR20\t" \
+                 "Mean HR21\tStandard Deviation HR21\tMedian HR21\tQ1 HR21\tQ3 HR21\t" \
+                 "Mean HR22\tStandard Deviation HR22\tMedian HR22\tQ1 HR22\tQ3 HR22\t" \
+                 "Mean HR23\tStandard Deviation HR23\tMedian HR23\tQ1 HR23\tQ3 HR23\t" \
+                 "Daylight Savings\n"
+HOURS = 24
+HOUR_MEAN_COLUMNS = [8 + 5 * n for n in range(HOURS)] # the Mean HR00 to Mean HR23 columns
+MISSING_VALUE = "N/A" # marks an hour without measurements
+
+
+def parseFeatureLines(lines):
+    """
+    Parses the ID, date and hourly mean columns of feature file rows, the other columns are not converted. The hourly
+    means of a whole block of rows are converted by numpy at once. Rows, that end before the last hourly mean, are
+    skipped.
+    :param lines: list of rows of a feature file, without the header
+    :return: tuple of the ids (list), the dates (datetime64[D] array) and the hourly means ((rows x 24) float64 array,
+    NaN where the value is missing)
+    """
+    lines = [line for line in lines if line.count("\t") >= HOUR_MEAN_COLUMNS[-1]]
+    ids = []
+    dates = []
+    for line in lines:
+        id, date, rest = line.split("\t", 2)
+        ids.append(id)
+        dates.append(date)
+    try:
+        means = np.loadtxt([line.replace(MISSING_VALUE, "nan") for line in lines], dtype=np.float64, delimiter="\t",
+                           usecols=HOUR_MEAN_COLUMNS, comments=None, ndmin=2)
+    except ValueError:
+        # some value is not a number, convert row by row and skip the broken rows
+        return parseFeatureLinesSlow(lines)
+    return ids, np.array(dates, dtype="datetime64[D]"), means.reshape(len(lines), HOURS)
+
+
+def parseFeatureLinesSlow(lines):
+    """
+    Row by row version of parseFeatureLines, for blocks that contain values, that are not numbers. Rows with such
+    values are skipped.
+    :param lines: list of complete rows of a feature file
+    :return: see parseFeatureLines
+    """
+    ids = []
+    dates = []
+    means = []
+    for line in lines:
+        values = line.split("\t")
+        try:
+            means.append([float(values[n]) if values[n] != MISSING_VALUE else np.nan for n in HOUR_MEAN_COLUMNS])
+        except ValueError:
+            continue
+        ids.append(values[0])
+        dates.append(values[1])
+    return ids, np.array(dates, dtype="datetime64[D]"), np.array(means, dtype=np.float64).reshape(len(ids), HOURS)
+
+
+def iterFeatureBlocks(file):
+    """
+    Reads the rows of a feature file block wise.
+    :param file: the feature file opened with fileReader.openLines, positioned after the header
+    :return: generator of blocks as returned by parseFeatureLines
+    """
+    block = file.readBlock()
+    while block:
+        yield parseFeatureLines(block)
+        block = file.readBlock()
+
+
+def readFeatureFile(fileName):
+    """
+    Reads the hourly means of all participants of a feature file.
+    :param fileName: path of the feature file, it may be gzip compressed
+    :return: dictionary of the participant ids, in order of their first row, to a tuple of the dates of their days
+    (datetime64[D] array) and a (days x 24) float64 array of the hourly means, NaN where the value is missing
+    """
+    participants = {}
+    with fileReader.openLines(fileName) as file:
+        if file.readline() != ACCELFEAT_HEADER:
+            # basics dont seem to be fullfilled
+            raise AttributeError("File seems to not fullfill the basic standards expected. (HEADER error)")
+        for ids, dates, means in iterFeatureBlocks(file):
+            # rows of a participant are mostly consecutive, so the block is split into runs of the same id
+            starts = [0] + [k for k in range(1, len(ids)) if ids[k] != ids[k - 1]] + [len(ids)]
+            for n in range(len(starts) - 1):
+                blocks = participants.setdefault(ids[starts[n]], ([], []))
+                blocks[0].append(dates[starts[n]:starts[n + 1]])
+                blocks[1].append(means[starts[n]:starts[n + 1]])
+    return {id: (np.concatenate(blocks[0]), np.concatenate(blocks[1])) for id, blocks in participants.items()}
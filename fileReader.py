@@ -0,0 +1,205 @@
+"""Shared reader for the plain and gzip compressed input files of epochConv and chronPercentile"""
+
+import codecs
+import io
+import os
+import profiler
+
+try:
+    # python-isal offers a zlib compatible interface, that decompresses considerably faster
+    from isal import isal_zlib as zlibBackend
+    DECOMPRESS_BACKEND = "isal"
+except ImportError:
+    import zlib as zlibBackend
+    DECOMPRESS_BACKEND = "zlib"
+
+READ_BLOCK_SIZE = 4 * 1024 * 1024 # number of bytes read from the disk at once
+GZIP_WBITS = 31 # tells zlib to expect a gzip header and trailer
+COMPRESSED_EXTENSIONS = (".gz",)
+
+
+class LineReader:
+    """
+    File like object that reads a plain or gzip compressed text file in large blocks and splits them into lines.
+    Each block is decompressed and decoded as a whole, instead of decoding every line on its own as gzip.open does.
+    Line endings are translated to "\\n" like a file opened in text mode.
+    """
+
+    def __init__(self, fileName, blockSize=READ_BLOCK_SIZE, encoding="utf-8"):
+        """
+        :param fileName: path of the file to read, files ending on .gz are decompressed
+        :param blockSize: number of bytes to read at once
+        :param encoding: encoding of the text in the file
+        """
+        self.name = fileName
+        self.blockSize = blockSize
+        self.encoding = encoding
+        self.compressed = fileName.endswith(COMPRESSED_EXTENSIONS)
+        self.file = open(fileName, "rb")
+        self.seek(0)
+
+    def seek(self, position):
+        """
+        Restarts reading at the beginning of the file, other positions are not supported.
+        :param position: needs to be 0
+        :return: 0
+        """
+        if position != 0:
+            raise io.UnsupportedOperation("LineReader can only seek to the start of the file")
+        self.file.seek(0)
+        self.decompressor = zlibBackend.decompressobj(GZIP_WBITS) if self.compressed else None
+        self.decoder = codecs.getincrementaldecoder(self.encoding)()
+        self.rest = ""
+        self.lines = []
+        self.lineIndex = 0
+        self.finished = False
+        self.started = False # whether the file holds any compressed data, an empty file is a complete one
+        return 0
+
+    def readBytes(self):
+        """
+        reads the next block of the file and decompresses it if necessary
+        :return: the (decompressed) bytes, empty once the end of the file is reached
+        :raises EOFError: if a compressed file ends inside a gzip member, like gzip.open does for truncated files
+        """
+        while True:
+            with profiler.stage("read"):
+                raw = self.file.read(self.blockSize)
+            profiler.count("bytesRead", len(raw))
+            if not self.compressed:
+                return raw
+            with profiler.stage("decompress"):
+                if not raw:
+                    data = self.decompressor.flush()
+                    if self.started and not self.decompressor.eof:
+                        raise EOFError("Compressed file ended before the end-of-stream marker was reached: "
+                                       + self.name)
+                    profiler.count("bytesDecompressed", len(data))
+                    return data
+                self.started = True
+                data = self.decompressor.decompress(raw)
+                while self.decompressor.eof and self.decompressor.unused_data:
+                    # the file consists of several gzip members, start over with the next one
+                    unused = self.decompressor.unused_data
+                    self.decompressor = zlibBackend.decompressobj(GZIP_WBITS)
+                    data += self.decompressor.decompress(unused)
+            profiler.count("bytesDecompressed", len(data))
+            if data:
+                return data
+
+    def readBlock(self):
+        """
+        Reads the next block of complete lines, each ending on "\\n" except possibly the last line of the file.
+        :return: list of lines, empty once the end of the file is reached
+        """
+        if self.lineIndex < len(self.lines):
+            # lines left over from readline or iteration come first
+            lines = self.lines[self.lineIndex:]
+            self.lines = []
+            self.lineIndex = 0
+            return lines
+        while not self.finished:
+            data = self.readBytes()
+            lines = self.splitLines(data)
+            if lines:
+                return lines
+        return []
+
+    def splitLines(self, data):
+        """
+        Decodes a block of bytes and splits it into lines, the incomplete last line is kept for the next block.
+        :param data: the bytes as returned by readBytes, empty at the end of the file
+        :return: list of the complete lines
+        """
+        with profiler.stage("decode"):
+            if data:
+                text = self.rest + self.decoder.decode(data)
+            else:
+                text = self.rest + self.decoder.decode(b"", final=True)
+                self.finished = True
+            end = len(text) if self.finished else text.rfind("\n") + 1
+            self.rest = text[end:]
+            text = text[:end]
+            if "\r" in text:
+                text = text.replace("\r\n", "\n").replace("\r", "\n")
+            lines = text.split("\n")
+            last = lines.pop()
+            lines = [line + "\n" for line in lines]
+            if last:
+                lines.append(last)
+            return lines
+
+    def readline(self):
+        """
+        :return: the next line, or an empty string at the end of the file
+        """
+        try:
+            return next(self)
+        except StopIteration:
+            return ""
+
+    def __iter__(self):
+        while True:
+            if self.lineIndex >= len(self.lines):
+                self.lines = self.readBlock()
+                self.lineIndex = 0
+                if not self.lines:
+                    return
+            lines = self.lines
+            for index in range(self.lineIndex, len(lines)):
+                # keep the position up to date, so that readline can continue after a partial iteration
+                self.lineIndex = index + 1
+                yield lines[index]
+
+    def __next__(self):
+        if self.lineIndex >= len(self.lines):
+            self.lines = self.readBlock()
+            self.lineIndex = 0
+            if not self.lines:
+                raise StopIteration
+        line = self.lines[self.lineIndex]
+        self.lineIndex += 1
+        return line
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+
+def openLines(fileName, blockSize=READ_BLOCK_SIZE):
+    """
+    Opens a plain or gzip compressed text file for reading with a LineReader.
+    :param fileName: path of the file to read
+    :param blockSize: number of bytes to read at once
+    :return: the LineReader of the file
+    """
+    with profiler.stage("open"):
+        return LineReader(fileName, blockSize)
+
+
+def listFiles(inputFiles, extensions):
+    """
+    Lists the input files of a batch run. A directory is searched for files with one of the given extensions, a plain
+    text file is read as a list of paths, one per line and relative to the directory of the list.
+    :param inputFiles: path of the directory or the list of files
+    :param extensions: tuple of the file extensions to look for in a directory
+    :return: a list of the paths of the files
+    """
+    fileList = []
+    if os.path.isfile(inputFiles):
+        dir = os.path.dirname(os.path.realpath(inputFiles))
+        with open(inputFiles, "r") as file:
+            for line in file:
+                fileList.append(os.path.join(dir,line.strip(" \n\t")))
+    else:
+        # it is a directory
+        for file in os.listdir(inputFiles):
+            fileName = os.path.join(inputFiles, file)
+            if os.path.isfile(fileName) and fileName.endswith(extensions):
+                fileList.append(fileName)
+    return fileList
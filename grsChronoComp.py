@@ -0,0 +1,121 @@
+"""
+Library interface of the GrsChronoComp scripts, to use them from other python code instead of the command line.
+The scripts stay flat modules next to this one, so it is a thin facade of functions calling into them rather than a
+package, and their directory needs to be on the python path. The scripts are only imported by the functions using
+them, so importing this module is cheap and e.g. converting chronPercentile files with convertTimes never loads the
+timezone database. Nothing but the standard library may be imported at module level here, test_startup.py checks that
+NumPy and pytz are not loaded by importing it.
+"""
+
+DEFAULT_PRECISION = 0.05 # how close a value needs to match a percentile, the default of chronPercentile -p
+
+
+def convertFile(fileName, epoch, outdir, prefix="", keepName=False, daylightSavingsTime=False, sidecar=False):
+    """
+    Converts a raw 5s file into one or several epochs, as epochConv does.
+    :param fileName: path of the raw file, .csv or .csv.gz
+    :param epoch: the epoch in seconds to convert to (a multiple of 5), or a list of epochs converted in a single pass
+    :param outdir: directory of the output files
+    :param prefix: replaces the file name of the outputs, or is put in front of it if keepName is True
+    :param keepName: see prefix
+    :param daylightSavingsTime: whether the timestamps should be adjusted for daylight savings time
+    :param sidecar: whether a binary copy of every output file should be written next to it, for chronPercentile
+    :return: list of the paths of the output files
+    :raises ValueError: if the file could not be converted
+    """
+    import epochConv
+    if epochConv.workFile(fileName, epoch, outdir, prefix, keepName, daylightSavingsTime, noConsoleOutput=True,
+                          sidecar=sidecar) == epochConv.STATUS_FAILED:
+        raise ValueError("The file {} could not be converted".format(fileName))
+    return epochConv.getOutFileNames(fileName, outdir, epoch, prefix, keepName)
+
+
+def readDays(fileName, lastDay=False, epoch=None, daylightSavingsTime=False):
+    """
+    Reads the measurements of a file day by day, any format chronPercentile accepts.
+    :param fileName: path of the file
+    :param lastDay: whether the last day of every participant should be read as well
+    :param epoch: epoch in seconds raw data is averaged to while reading, None to read it as it is
+    :param daylightSavingsTime: whether raw data averaged to an epoch gets daylight savings time adjusted timestamps
+    :return: generator of (id, chronPercentile.DayData) tuples
+    """
+    import chronPercentile
+    return chronPercentile.iterData(fileName, lastDay, epoch, daylightSavingsTime)
+
+
+def dayPercentiles(day, percentiles, asTime=False, precision=DEFAULT_PRECISION):
+    """
+    :param day: chronPercentile.DayData of a single day, as yielded by readDays
+    :param percentiles: list of percentiles as fractions of 1 or as values in the range 1-100
+    :param asTime: whether the results should be times instead of percentages of the day
+    :param precision: how close a value needs to match a percentile
+    :return: list of the results in the order of the percentiles, "NA" where there is none
+    """
+    import chronPercentile
+    return chronPercentile.chronPercentileDay(day, chronPercentile.getPercentages(percentiles), not asTime, precision)
+
+
+def analyzeFile(fileName, percentiles, asTime=False, precision=DEFAULT_PRECISION, wakeFile=None, epoch=None,
+                daylightSavingsTime=False):
+    """
+    Calculates the percentiles of every day of a file, or of every wake period if a wake file is given, as
+    chronPercentile does.
+    :param fileName: path of the file
+    :param percentiles: list of percentiles as fractions of 1 or as values in the range 1-100
+    :param asTime: whether the results should be times instead of percentages of the day or wake period
+    :param precision: how close a value needs to match a percentile
+    :param wakeFile: path of a wake file, None to analyze the whole days
+    :param epoch: epoch in seconds raw data is averaged to before the analysis, None to analyze it as it is
+    :param daylightSavingsTime: whether raw data averaged to an epoch gets daylight savings time adjusted timestamps
+    :return: list of (id, date, list of results) tuples
+    """
+    import chronPercentile
+    percentages = chronPercentile.getPercentages(percentiles)
+    wakeInfo = chronPercentile.loadWakeIndex(wakeFile) if wakeFile != None else None
+    results = []
+    for id, profile in chronPercentile.iterFileProfiles(fileName, wakeInfo, epoch, daylightSavingsTime):
+        if wakeInfo == None:
+            results.append((id, chronPercentile.getProfileDate(profile),
+                            chronPercentile.dayPercentiles(profile, percentages, not asTime, precision)))
+        elif profile != None:
+            results.extend((id, date, periodResults) for date, periodResults in
+                           chronPercentile.wakePercentiles(profile, percentages, not asTime, precision))
+    return results
+
+
+def convertTimes(fileName, outFileName="", precision=5, seconds=False):
+    """
+    Converts the times of a chronPercentile -t output into percentages of the day, as dayPercentage does.
+    :param fileName: path of the chronPercentile output
+    :param outFileName: path of the converted file, it is appended to. An empty string prints it.
+    :param precision: number of decimal places of the percentages
+    :param seconds: whether the times are converted to seconds since midnight instead
+    :return: none
+    """
+    import dayPercentage
+    dayPercentage.convertPercentages(fileName, outFileName, precision, seconds)
+
+
+def readFeatureFile(fileName):
+    """
+    :param fileName: path of an accelerometer feature file
+    :return: dictionary of the participant ids to a tuple of the dates of their days and a (days x 24) array of the
+    hourly means, see featureReader.readFeatureFile
+    """
+    import featureReader
+    return featureReader.readFeatureFile(fileName)
+
+
+def evaluateChronotypes(fileName, morningHours=(6, 12), eveningHours=(18, 24), margin=0.1):
+    """
+    Classifies the participants of an accelerometer feature file as morning or evening chronotypes, as
+    evalAccChronType does.
+    :param fileName: path of the feature file
+    :param morningHours: tuple of the first hour and the end hour (not included) of the morning
+    :param eveningHours: tuple of the first hour and the end hour (not included) of the evening
+    :param margin: fraction one window needs to be more active than the other to decide the chronotype
+    :return: tuple of the list of the participant ids and the dictionary of the results, see evalAccChronType.evalChrono
+    """
+    import evalAccChronType
+    dataSet = evalAccChronType.getHourlyData(evalAccChronType.readData(fileName))
+    return dataSet.ids, evalAccChronType.evalChrono(dataSet, morningHours, eveningHours, margin)
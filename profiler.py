@@ -0,0 +1,207 @@
+"""Low overhead instrumentation of the processing stages of epochConv and chronPercentile, see their --profile flags"""
+
+import contextlib
+import json
+import platform
+import time
+try:
+    import resource
+except ImportError:
+    # not available on windows, peak memory is not reported there
+    resource = None
+
+ACTIVE = None # the Profile collecting the measurements, None while nothing is profiled
+
+
+class Profile:
+    """
+    Time spent in the stages of processing a file and counters like the number of bytes read. Stages can be nested,
+    the time of a stage does not include the time of the stages inside it, so the times of all stages add up to at
+    most the total time.
+    """
+
+    def __init__(self, name):
+        """
+        :param name: name of the profiled file or run
+        """
+        self.name = name
+        self.times = {}
+        self.calls = {}
+        self.counters = {}
+        self.stack = [] # [start, time of nested stages] of every open stage
+        self.start = time.perf_counter()
+        self.end = None
+
+    def enter(self):
+        self.stack.append([time.perf_counter(), 0.0])
+
+    def exit(self, stage):
+        start, nested = self.stack.pop()
+        elapsed = time.perf_counter() - start
+        self.times[stage] = self.times.get(stage, 0.0) + elapsed - nested
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+        if self.stack:
+            self.stack[-1][1] += elapsed
+
+    def stage(self, name):
+        """
+        :param name: name of the stage
+        :return: context manager measuring the time of a stage in this Profile, even if it is not the active one
+        """
+        return Stage(self, name)
+
+    def count(self, counter, value):
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def report(self):
+        """
+        :return: dictionary of the measurements, as written to the --profile reports
+        """
+        seconds = (self.end if self.end != None else time.perf_counter()) - self.start
+        return getReport(self.name, seconds, {stage: {"seconds": self.times[stage], "calls": self.calls[stage]}
+                                              for stage in self.times}, dict(self.counters), getPeakMemory())
+
+
+class Stage:
+    """
+    Context manager measuring the time of a stage in a Profile
+    """
+    __slots__ = ("profile", "name")
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.profile.enter()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.profile.exit(self.name)
+
+
+NO_STAGE = contextlib.nullcontext() # handed out by stage while nothing is profiled
+
+
+def stage(name):
+    """
+    Measures the time of a block as stage of the active Profile: with profiler.stage("parse"): ...
+    :param name: name of the stage
+    :return: context manager, that does nothing if nothing is profiled
+    """
+    if ACTIVE is None:
+        return NO_STAGE
+    return Stage(ACTIVE, name)
+
+
+def count(counter, value=1):
+    """
+    Adds to a counter of the active Profile, nothing happens if nothing is profiled
+    :param counter: name of the counter
+    :param value: amount to add
+    :return: none
+    """
+    if ACTIVE is not None:
+        ACTIVE.count(counter, value)
+
+
+def timedIter(iterable, name):
+    """
+    Measures the time spent producing the items of an iterable, e.g. a generator reading a file, as a stage. The time
+    the consumer spends with the items is not included.
+    :param iterable: the iterable
+    :param name: name of the stage
+    :return: generator of the items of the iterable
+    """
+    if ACTIVE is None:
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+@contextlib.contextmanager
+def profile(name):
+    """
+    Makes a new Profile the active one for the duration of a block, the previous one is active again afterwards.
+    :param name: name of the profiled file or run
+    :return: context manager yielding the Profile
+    """
+    global ACTIVE
+    previous = ACTIVE
+    ACTIVE = Profile(name)
+    try:
+        yield ACTIVE
+    finally:
+        ACTIVE.end = time.perf_counter()
+        ACTIVE = previous
+
+
+def getPeakMemory():
+    """
+    :return: peak resident memory of the process so far in KB, None if it can not be determined
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if platform.system() == "Darwin" else peak # bytes on macOS, KB elsewhere
+
+
+def getReport(name, seconds, stages, counters, peakMemory):
+    """
+    :param name: name of the file or run
+    :param seconds: total time in seconds
+    :param stages: dictionary of the stage names to dictionaries of their "seconds" and "calls"
+    :param counters: dictionary of the counters
+    :param peakMemory: peak resident memory in KB, None if unknown
+    :return: dictionary of the measurements with the throughput and the time outside of any stage added
+    """
+    return {"name": name, "seconds": seconds, "stages": stages,
+            "unmeasuredSeconds": seconds - sum(stage["seconds"] for stage in stages.values()),
+            "counters": counters,
+            "samplesPerSecond": counters.get("samples", 0) / seconds if seconds > 0 else None,
+            "bytesPerSecond": counters.get("bytesRead", 0) / seconds if seconds > 0 else None,
+            "peakRSSKB": peakMemory}
+
+
+def aggregate(reports, name="all files"):
+    """
+    Sums up the reports of several files. The peak memory is the highest of the reports, the throughput is based on
+    the summed up time, which exceeds the run time, if the files were processed in parallel.
+    :param reports: list of reports as returned by Profile.report
+    :param name: name of the aggregate report
+    :return: report of all files together
+    """
+    stages = {}
+    counters = {}
+    for report in reports:
+        for stageName, values in report["stages"].items():
+            total = stages.setdefault(stageName, {"seconds": 0.0, "calls": 0})
+            total["seconds"] += values["seconds"]
+            total["calls"] += values["calls"]
+        for counter, value in report["counters"].items():
+            counters[counter] = counters.get(counter, 0) + value
+    peaks = [report["peakRSSKB"] for report in reports if report["peakRSSKB"] != None]
+    result = getReport(name, sum(report["seconds"] for report in reports), stages, counters,
+                       max(peaks) if peaks else None)
+    result["files"] = len(reports)
+    return result
+
+
+def writeReport(fileName, run, reports):
+    """
+    Writes the --profile report of a run as JSON
+    :param fileName: path of the report
+    :param run: report of the work done outside of the files, e.g. loading the wake file and writing the results
+    :param reports: list of the reports of every file
+    :return: none
+    """
+    with open(fileName, "w") as reportFile:
+        json.dump({"run": run, "aggregate": aggregate(reports), "files": reports}, reportFile, indent=2)
+        reportFile.write("\n")
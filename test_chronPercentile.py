@@ -0,0 +1,53 @@
+"""
+Checks that chronPercentile -w skips files of participants without a numeric id, like the outputs of epochConv -p,
+instead of stopping the run, in the serial, the --jobs and the --shared runs. Run with python -m pytest or
+python -m unittest.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import benchmark
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chronPercentile.py")
+
+
+class NonNumericIdTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.data = benchmark.generateData(cls.directory, 2, 3)
+        cls.prefixed = os.path.join(cls.data["epochDir"], "p1_avg_60.tsv")
+        shutil.copyfile(cls.data["epochFiles"][0], cls.prefixed)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def run_chronPercentile(self, fileList, options):
+        listFile = os.path.join(self.directory, "files.txt")
+        with open(listFile, "w") as file:
+            file.write("\n".join(fileList) + "\n")
+        outFile = os.path.join(self.directory, "out.tsv")
+        process = subprocess.run([sys.executable, SCRIPT, listFile, "0.25", "0.5", "-w", self.data["wakeFile"],
+                                  "-o", outFile] + options, capture_output=True, text=True)
+        self.assertEqual(process.returncode, 0, process.stderr)
+        self.assertNotIn("Traceback", process.stdout + process.stderr)
+        with open(outFile) as file:
+            return process.stdout, file.read()
+
+    def test_skips_non_numeric_id(self):
+        stdout, expected = self.run_chronPercentile(self.data["epochFiles"], [])
+        for options in ([], ["--jobs", "2"], ["--jobs", "2", "--shared"]):
+            with self.subTest(" ".join(options)):
+                stdout, output = self.run_chronPercentile([self.prefixed] + self.data["epochFiles"], options)
+                self.assertIn("ID p1 could not be found in given sleep data set.", stdout)
+                self.assertEqual(output, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
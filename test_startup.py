@@ -0,0 +1,22 @@
+"""
+Checks that importing a script does not load the modules it must not, like NumPy for dayPercentage and grsChronoComp
+or the timezone database for any script, see STARTUP_BUDGETS in benchmark.py. Every script is imported in a new
+interpreter, whose sys.modules is checked afterwards. The import times are measured by benchmark.py --startup, they
+depend too much on the machine for a test. Run with python -m pytest or python -m unittest.
+"""
+
+import unittest
+import benchmark
+
+
+class StartupTest(unittest.TestCase):
+
+    def test_forbidden_modules(self):
+        for name, (budget, forbidden) in benchmark.STARTUP_BUDGETS.items():
+            with self.subTest(name):
+                seconds, loaded = benchmark.measureStartup(name)
+                self.assertEqual(sorted(set(forbidden) & loaded), [], "modules {} must not load".format(name))
+
+
+if __name__ == "__main__":
+    unittest.main()